@@ -1,5 +1,20 @@
+import argparse
 import csv
+import os
 import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+try:
+    from pyproj import Transformer
+except ImportError:  # only needed for the lat/lon stage
+    Transformer = None
 
 # note - change this to a json import? 
 grid_square_offsets = {
@@ -118,10 +133,12 @@ def ngr_to_east_north(grid_ref):
     if not match:
         return None, None
     prefix, digits = match.groups()
-    if prefix not in prefixes:
+    if prefix not in grid_square_offsets:
         print("prifix does not match known grid squares")
         return None, None
-    
+    if len(digits) % 2:
+        # an odd number of digits can't be split into easting and northing
+        return None, None
 
     offset_x, offset_y = grid_square_offsets[prefix]
     length = len(digits) // 2
@@ -130,33 +147,463 @@ def ngr_to_east_north(grid_ref):
     northing = offset_y + int(digits[length:]) * scale
     return easting, northing
 
-# Process the CSV file
-def process_csv(input_file, output_file):
+# Build a 26x26 letter-pair lookup table from grid_square_offsets so the bulk
+# converter can index offsets with array maths instead of dict lookups
+def build_offset_table():
+    offset_table = np.zeros((26, 26, 2), dtype=np.int64)
+    known_squares = np.zeros((26, 26), dtype=bool)
+    for prefix, (offset_x, offset_y) in grid_square_offsets.items():
+        first, second = ord(prefix[0]) - 65, ord(prefix[1]) - 65
+        offset_table[first, second] = (offset_x, offset_y)
+        known_squares[first, second] = True
+    return offset_table, known_squares
+
+# Build the metres each of the 10 digit positions is worth, for every
+# precision (digits per half, 0-5). Whatever the precision, the i-th digit
+# of each half is worth 10**(4 - i) metres.
+def build_place_values():
+    east_places = np.zeros((6, 10), dtype=np.int32)
+    north_places = np.zeros((6, 10), dtype=np.int32)
+    for half in range(1, 6):
+        for i in range(half):
+            east_places[half, i] = 10 ** (4 - i)
+            north_places[half, half + i] = 10 ** (4 - i)
+    return east_places, north_places
+
+offset_table, known_squares = build_offset_table()
+east_places, north_places = build_place_values()
+
+# Convert a whole column of NGRs (list, NumPy array or pandas Series) in one
+# vectorized pass. Returns float easting and northing arrays plus a validity
+# mask; invalid refs come back as NaN rather than raising.
+def ngr_to_east_north_bulk(grid_refs):
+    refs = np.asarray(grid_refs, dtype=str).ravel()
+    n_refs = refs.shape[0]
+    easting = np.full(n_refs, np.nan)
+    northing = np.full(n_refs, np.nan)
+    if n_refs == 0 or refs.dtype.itemsize == 0:
+        return easting, northing, np.zeros(n_refs, dtype=bool)
+
+    # work on the raw UCS-4 code points: one row of characters per ref,
+    # NUL-padded on the right
+    width = refs.dtype.itemsize // 4
+    codes = refs.view(np.uint32).reshape(n_refs, width)
+
+    # squeeze out spaces by stable-sorting them (and the padding) to the end,
+    # only for the refs that actually contain one
+    spaced = np.flatnonzero((codes == 32).any(axis=1))
+    if spaced.size:
+        codes = codes.copy()
+        blank = (codes[spaced] == 32) | (codes[spaced] == 0)
+        order = np.argsort(blank, axis=1, kind='stable')
+        codes[spaced] = np.where(np.sort(blank, axis=1, kind='stable'), 0,
+                                 np.take_along_axis(codes[spaced], order, axis=1))
+    length = np.count_nonzero(codes, axis=1)
+
+    # only the first 12 characters can be part of a valid ref (2 letters + 10 digits);
+    # anything outside ASCII is clamped so it can never pass as a letter or digit
+    if width < 12:
+        codes = np.pad(codes, ((0, 0), (0, 12 - width)))
+    codes = np.minimum(codes[:, :12], 255).astype(np.int16)
+
+    # upper-case the letter pair and look up the grid square offsets
+    letters = codes[:, :2]
+    letters = np.where((letters >= 97) & (letters <= 122), letters - 32, letters) - 65
+    letters_ok = np.all((letters >= 0) & (letters < 26), axis=1)
+    letters[~letters_ok] = 0
+    square_ok = letters_ok & known_squares[letters[:, 0], letters[:, 1]]
+
+    # digits must fill the rest of the ref, with an even count from 2 to 10
+    n_digits = length - 2
+    digits = codes[:, 2:] - 48
+    in_ref = np.arange(10) < n_digits[:, None]
+    digits_ok = np.all(((digits >= 0) & (digits <= 9)) | ~in_ref, axis=1)
+    valid = (square_ok & digits_ok & (n_digits >= 2) & (n_digits <= 10)
+             & (n_digits % 2 == 0))
+
+    half = np.where(valid, n_digits // 2, 0)
+    digits = digits[valid].astype(np.int32)
+    offsets = offset_table[letters[valid, 0], letters[valid, 1]]
+    half = half[valid]
+    easting[valid] = offsets[:, 0] + np.einsum('ij,ij->i', digits, east_places[half])
+    northing[valid] = offsets[:, 1] + np.einsum('ij,ij->i', digits, north_places[half])
+    return easting, northing, valid
+
+# The prefixes grid as an array, indexed [northing // 100km, easting // 100km]
+prefix_grid = np.array(prefixes)
+
+# Encode easting/northing arrays as NGR strings at the given precision (total
+# digits, 2 to 10). Points that are NaN or fall outside the grid come back as ''.
+def east_north_to_ngr_bulk(easting, northing, precision=10):
+    if precision not in (2, 4, 6, 8, 10):
+        raise ValueError("precision must be an even number of digits from 2 to 10")
+    easting = np.asarray(easting, dtype=float).ravel()
+    northing = np.asarray(northing, dtype=float).ravel()
+    if not easting.size:
+        return np.array([], dtype=str)
+    half = precision // 2
+
+    column = np.floor(easting / 100000)
+    row = np.floor(northing / 100000)
+    valid = ((column >= 0) & (column < prefix_grid.shape[1])
+             & (row >= 0) & (row < prefix_grid.shape[0]))
+    column = np.where(valid, column, 0).astype(np.int64)
+    row = np.where(valid, row, 0).astype(np.int64)
+
+    # truncate (not round) to the precision, as the digits of an NGR do
+    scale = 10 ** (5 - half)
+    east_digits = (np.where(valid, easting, 0) - column * 100000) // scale
+    north_digits = (np.where(valid, northing, 0) - row * 100000) // scale
+    refs = np.char.add(np.char.add(prefix_grid[row, column],
+                                   np.char.zfill(east_digits.astype(np.int64).astype(str), half)),
+                       np.char.zfill(north_digits.astype(np.int64).astype(str), half))
+    return np.where(valid, refs, '')
+
+# Build a pyproj Transformer once per source/target pair and reuse it; creating
+# one is far more expensive than transforming a whole array with it
+@lru_cache(maxsize=None)
+def get_transformer(source_crs, target_crs):
+    if Transformer is None:
+        raise ImportError("pyproj is required for CRS transforms (pip install pyproj)")
+    return Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+# Transform British National Grid easting/northing arrays to WGS84 lat/lon in
+# one call. NaN inputs come back as NaN.
+def east_north_to_lat_lon(easting, northing):
+    easting = np.asarray(easting, dtype=float).ravel()
+    northing = np.asarray(northing, dtype=float).ravel()
+    latitude = np.full(easting.shape, np.nan)
+    longitude = np.full(easting.shape, np.nan)
+    finite = np.isfinite(easting) & np.isfinite(northing)
+    if finite.any():
+        transformer = get_transformer("EPSG:27700", "EPSG:4326")
+        longitude[finite], latitude[finite] = transformer.transform(easting[finite], northing[finite])
+    return latitude, longitude
+
+# Convert a column of NGRs straight to WGS84. Returns lat, lon and the validity mask.
+def ngr_to_lat_lon_bulk(grid_refs):
+    easting, northing, valid = ngr_to_east_north_bulk(grid_refs)
+    latitude, longitude = east_north_to_lat_lon(easting, northing)
+    return latitude, longitude, valid
+
+# Find the NGR column from the CSV header
+def find_ngr_column(fieldnames):
+    for column in fieldnames:
+        if "NGR" in column.upper():
+            return column
+    raise ValueError("No NGR column found in the CSV file.")
+
+# Find the easting and northing columns from the CSV header
+def find_east_north_columns(fieldnames):
+    lowered = [column.strip().lower() for column in fieldnames]
+    for name in ('easting', 'northing'):
+        if name not in lowered:
+            raise ValueError(f"No {name} column found in the CSV file.")
+    return lowered.index('easting'), lowered.index('northing')
+
+# Turn a chunk of bulk results into CSV cell values: whole metres, blank if invalid
+def format_coords(coords, valid):
+    cells = np.where(valid, coords, 0).astype(np.int64).astype(str)
+    cells[~valid] = ''
+    return cells.tolist()
+
+# Turn a chunk of lat/lon results into CSV cell values, blank if invalid
+def format_degrees(degrees, valid):
+    cells = np.char.mod('%.7f', np.where(valid, degrees, 0))
+    cells[~valid] = ''
+    return cells.tolist()
+
+# Pad short rows to the header width so new columns line up
+def pad_rows(rows, n_columns):
+    for row in rows:
+        if len(row) < n_columns:
+            row.extend([''] * (n_columns - len(row)))
+
+# Output columns added by the forward conversion
+def converted_columns(latlon=False):
+    return ['easting', 'northing'] + (['latitude', 'longitude'] if latlon else [])
+
+# Convert one chunk of CSV rows and write it straight out, optionally adding
+# WGS84 lat/lon columns as well
+def convert_chunk(rows, ngr_index, n_columns, writer, latlon=False):
+    pad_rows(rows, n_columns)
+    ngrs = [row[ngr_index] for row in rows]
+    easting, northing, valid = ngr_to_east_north_bulk(ngrs)
+    new_columns = [format_coords(easting, valid), format_coords(northing, valid)]
+    if latlon:
+        latitude, longitude = east_north_to_lat_lon(easting, northing)
+        new_columns += [format_degrees(latitude, valid), format_degrees(longitude, valid)]
+    for row, *values in zip(rows, *new_columns):
+        row.extend(values)
+    writer.writerows(rows)
+
+# Stream csv rows through the converter in chunks of chunk_size rows. Blank
+# lines are skipped, as csv.DictReader always has
+def convert_rows(reader, ngr_index, n_columns, writer, chunk_size, latlon=False):
+    reader = filter(None, reader)
+    while True:
+        rows = list(islice(reader, chunk_size))
+        if not rows:
+            break
+        convert_chunk(rows, ngr_index, n_columns, writer, latlon)
+
+# Process the CSV file, streaming it through in chunks of chunk_size rows so
+# memory stays flat however big the input is
+def process_csv(input_file, output_file, chunk_size=100_000, latlon=False):
+    with open(input_file, newline='', encoding='utf-8') as infile, \
+            open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        ngr_index = header.index(find_ngr_column(header))
+        writer = csv.writer(outfile)
+        writer.writerow(header + converted_columns(latlon))
+        convert_rows(reader, ngr_index, len(header), writer, chunk_size, latlon)
+
+# Parse a column of cells as floats. Blank or non-numeric cells (e.g. 'n/a') become
+# NaN, so they get a blank NGR instead of stopping the whole file
+def parse_floats(cells):
+    try:
+        return np.array([cell or 'nan' for cell in cells], dtype=float)
+    except ValueError:
+        pass
+    values = np.full(len(cells), np.nan)
+    for i, cell in enumerate(cells):
+        try:
+            values[i] = float(cell)
+        except ValueError:
+            pass
+    return values
+
+# Add an NGR column to a CSV with easting and northing columns, streaming it
+# through in chunks like process_csv
+def reverse_csv(input_file, output_file, precision=10, chunk_size=100_000):
+    with open(input_file, newline='', encoding='utf-8') as infile, \
+            open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        east_index, north_index = find_east_north_columns(header)
+        writer = csv.writer(outfile)
+        writer.writerow(header + ['ngr'])
+
+        reader = filter(None, reader)  # skip blank lines, as process_csv does
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                break
+            pad_rows(rows, len(header))
+            easting = parse_floats([row[east_index] for row in rows])
+            northing = parse_floats([row[north_index] for row in rows])
+            for row, ref in zip(rows, east_north_to_ngr_bulk(easting, northing, precision).tolist()):
+                row.append(ref)
+            writer.writerows(rows)
+
+# Split the body of the CSV (everything after the header line) into
+# n_shards byte ranges, each starting and ending on a line boundary
+def find_shard_offsets(input_file, n_shards):
+    file_size = os.path.getsize(input_file)
+    with open(input_file, 'rb') as infile:
+        infile.readline()
+        boundaries = [infile.tell()]
+        body_size = file_size - boundaries[0]
+        for i in range(1, n_shards):
+            target = boundaries[0] + body_size * i // n_shards
+            if target <= boundaries[-1]:
+                continue
+            infile.seek(target - 1)
+            infile.readline()
+            boundaries.append(min(infile.tell(), file_size))
+    boundaries.append(file_size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+# Yield the decoded lines of one byte range of the input
+def read_shard_lines(infile, start, end):
+    infile.seek(start)
+    position = start
+    while position < end:
+        line = infile.readline()
+        if not line:
+            break
+        position += len(line)
+        yield line.decode('utf-8')
+
+# Worker: convert one shard of the input into its own part file. Returns the
+# part file and the number of quote characters in the shard
+def convert_shard(input_file, start, end, part_file, ngr_index, n_columns, chunk_size, latlon):
+    quotes = 0
+
+    def count_quotes(lines):
+        nonlocal quotes
+        for line in lines:
+            quotes += line.count('"')
+            yield line
+
+    with open(input_file, 'rb') as infile, \
+            open(part_file, 'w', newline='', encoding='utf-8') as outfile:
+        reader = csv.reader(count_quotes(read_shard_lines(infile, start, end)))
+        convert_rows(reader, ngr_index, n_columns, csv.writer(outfile), chunk_size, latlon)
+    return part_file, quotes
+
+# A shard boundary falls inside a quoted field (one with a line break in it) if
+# an odd number of quote characters come before it, as quotes inside a quoted
+# field are doubled. header_quotes counts those before the first shard.
+def splits_quoted_field(header_quotes, shard_quotes):
+    quotes = header_quotes
+    for count in shard_quotes[:-1]:
+        if quotes % 2:
+            return True
+        quotes += count
+    return bool(quotes % 2)
+
+# Process the CSV file across a pool of worker processes. The body is split
+# into line-aligned byte ranges, each worker converts its own range to a part
+# file and the parts are stitched back together in the original row order.
+# If a split lands inside a quoted field containing a line break, the parts
+# are thrown away and the file is converted by process_csv instead.
+def process_csv_parallel(input_file, output_file, workers=None, chunk_size=100_000, latlon=False):
+    workers = workers or os.cpu_count() or 1
     with open(input_file, newline='', encoding='utf-8') as infile:
-        reader = csv.DictReader(infile)
-        fieldnames = reader.fieldnames + ['easting', 'northing']
-        rows = []
-
-        for row in reader:
-            for column in row:
-                if "NGR" in column.upper():  # Identify the NGR column
-                    ngr_column = column
-                    break
-            else:
-                raise ValueError("No NGR column found in the CSV file.")
-
-            ngr = row[ngr_column]
-            easting, northing = ngr_to_east_north(ngr)
-            row['Easting'] = easting
-            row['Northing'] = northing
-            rows.append(row)
-
-    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
-
-input_csv = 'input.csv'
-output_csv = 'output.csv'
-process_csv(input_csv, output_csv)
+        header = next(csv.reader(infile))
+    ngr_index = header.index(find_ngr_column(header))
+    shards = find_shard_offsets(input_file, workers)
+    part_files = [f"{output_file}.part{i}" for i in range(len(shards))]
+    with open(input_file, 'rb') as infile:
+        header_quotes = infile.read(shards[0][0] if shards else 0).count(b'"')
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(convert_shard, input_file, start, end, part_file,
+                                       ngr_index, len(header), chunk_size, latlon)
+                       for (start, end), part_file in zip(shards, part_files)]
+            shard_quotes = [future.result()[1] for future in futures]
+
+        if splits_quoted_field(header_quotes, shard_quotes):
+            print("A quoted field with a line break spans the shards; converting in a single process instead")
+            process_csv(input_file, output_file, chunk_size, latlon)
+            return
+
+        with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+            csv.writer(outfile).writerow(header + converted_columns(latlon))
+        with open(output_file, 'ab') as outfile:
+            for part_file in part_files:
+                with open(part_file, 'rb') as part:
+                    shutil.copyfileobj(part, outfile, 16 * 1024 * 1024)
+    finally:
+        for part_file in part_files:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+# Make a column of random NGRs at mixed precisions, with some junk mixed in
+def make_random_ngrs(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    squares = np.array(list(grid_square_offsets))
+    refs = []
+    for square, n_digits in zip(rng.choice(squares, n_rows), rng.choice([2, 4, 6, 8, 10], n_rows)):
+        half = n_digits // 2
+        refs.append(f"{square}{rng.integers(0, 10 ** half):0{half}d}{rng.integers(0, 10 ** half):0{half}d}")
+    for i in rng.choice(n_rows, n_rows // 50, replace=False):
+        refs[i] = rng.choice(["", "TQ12A4", "TQ123", "not an ngr", "tq 12 34"])
+    return refs
+
+# Time the per-row function against the bulk converter on the same column
+def benchmark_conversion(n_rows=1_000_000):
+    refs = make_random_ngrs(n_rows)
+
+    start = time.perf_counter()
+    per_row = [ngr_to_east_north(ref) for ref in refs]
+    per_row_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    easting, northing, valid = ngr_to_east_north_bulk(refs)
+    bulk_seconds = time.perf_counter() - start
+
+    expected = np.array([(e, n) if e is not None else (np.nan, np.nan) for e, n in per_row])
+    if not np.array_equal(expected, np.column_stack([easting, northing]), equal_nan=True):
+        raise AssertionError("bulk conversion does not match the per-row function")
+
+    print(f"{n_rows} refs ({valid.sum()} valid)")
+    print(f"per-row: {per_row_seconds:.3f}s ({n_rows / per_row_seconds:,.0f} refs/s)")
+    print(f"bulk:    {bulk_seconds:.3f}s ({n_rows / bulk_seconds:,.0f} refs/s)")
+    print(f"speedup: {per_row_seconds / bulk_seconds:.1f}x")
+
+
+# Write a synthetic site register with an NGR column for benchmarking
+def write_random_register(path, n_rows, seed=0):
+    with open(path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(['site_id', 'site_name', 'NGR'])
+        for i, ref in enumerate(make_random_ngrs(n_rows, seed)):
+            writer.writerow([i, f"site {i}", ref])
+
+# Time the serial streaming converter against the process pool at 1, 2, 4...
+# workers up to the machine's core count
+def benchmark_scaling(n_rows=2_000_000, max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != max_workers:
+        worker_counts.append(max_workers)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_file = os.path.join(temp_dir, 'register.csv')
+        output_file = os.path.join(temp_dir, 'converted.csv')
+        write_random_register(input_file, n_rows)
+
+        start = time.perf_counter()
+        process_csv(input_file, output_file)
+        serial_seconds = time.perf_counter() - start
+        print(f"{n_rows} rows, {os.cpu_count()} cores")
+        print(f"serial:     {serial_seconds:.3f}s ({n_rows / serial_seconds:,.0f} rows/s)")
+
+        for workers in worker_counts:
+            start = time.perf_counter()
+            process_csv_parallel(input_file, output_file, workers)
+            seconds = time.perf_counter() - start
+            print(f"{workers:>2} workers: {seconds:.3f}s ({n_rows / seconds:,.0f} rows/s, "
+                  f"{serial_seconds / seconds:.2f}x serial)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Add easting/northing columns to a CSV with an NGR column, "
+                                                 "or an NGR column to a CSV with easting/northing columns.")
+    parser.add_argument('input_csv', nargs='?', help="CSV with a column whose name contains 'NGR' "
+                                                     "(or easting and northing columns with --reverse)")
+    parser.add_argument('output_csv', nargs='?', help="where to write the converted CSV")
+    parser.add_argument('--chunk-size', type=int, default=100_000,
+                        help="rows to read, convert and write at a time (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes to split the file across; 0 uses every core (default: %(default)s)")
+    parser.add_argument('--latlon', action='store_true',
+                        help="also add WGS84 latitude/longitude columns (needs pyproj)")
+    parser.add_argument('--reverse', action='store_true',
+                        help="convert easting/northing columns to an NGR column instead")
+    parser.add_argument('--precision', type=int, default=10, choices=[2, 4, 6, 8, 10],
+                        help="digits in the NGRs written by --reverse (default: %(default)s)")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="time the per-row and bulk converters instead of converting a file")
+    parser.add_argument('--benchmark-scaling', action='store_true',
+                        help="time the parallel converter at increasing worker counts")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_conversion()
+        return
+    if args.benchmark_scaling:
+        benchmark_scaling()
+        return
+    if not args.input_csv or not args.output_csv:
+        parser.error("input_csv and output_csv are required")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.workers < 0:
+        parser.error("--workers can't be negative")
+    if args.reverse:
+        reverse_csv(args.input_csv, args.output_csv, args.precision, args.chunk_size)
+    elif args.workers == 1:
+        process_csv(args.input_csv, args.output_csv, args.chunk_size, args.latlon)
+    else:
+        process_csv_parallel(args.input_csv, args.output_csv, args.workers or None,
+                             args.chunk_size, args.latlon)
+
+
+if __name__ == '__main__':
+    main()
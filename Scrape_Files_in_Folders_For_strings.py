@@ -1,8 +1,47 @@
 import csv
 import os
 import re
-from docx import Document
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import time
+import hashlib
+import sqlite3
+import zipfile
+import argparse
+import posixpath
+import multiprocessing
+import xml.etree.ElementTree as ET
+from contextlib import closing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fast_walk import walk, walk_folders
+
+try:
+    from docx import Document
+except ImportError:  # only needed for the python-docx comparison in the benchmark
+    Document = None
+
+try:
+    import ahocorasick
+except ImportError:  # optional, match_keys_to_folders falls back to substring lookups
+    ahocorasick = None
+
+# Annotated Regex Pattern: Modify this pattern as needed
+regex_pattern = r'your_regex_here'
+
+# Named patterns, all looked for in the same pass over each document. Each name becomes a
+# column in the output CSV, e.g. {'author': r'Author: (.+)', 'postcode': r'[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}'}
+patterns = {'your_value_here': regex_pattern}
+
+# set in each worker process by init_worker, so the patterns are compiled once per process
+compiled_patterns = {}
+extraction_options = {}
+
+# WordprocessingML tags the streaming extractor looks at
+w = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+w_document, w_body, w_hdr, w_ftr = w + 'document', w + 'body', w + 'hdr', w + 'ftr'
+w_p, w_r, w_hyperlink, w_tc = w + 'p', w + 'r', w + 'hyperlink', w + 'tc'
+w_br, w_type = w + 'br', w + 'type'
+# run content and its text, as python-docx's Run.text maps it (w:br is handled separately)
+run_text = {w + 'tab': '\t', w + 'ptab': '\t', w + 'cr': '\n', w + 'noBreakHyphen': '-'}
 
 # Filter the CSV entries to look for specific key strings
 def filter_csv(input_csv, key_string):
@@ -14,25 +53,187 @@ def filter_csv(input_csv, key_string):
                 filtered_rows.append(row)
     return filtered_rows
 
+# Lists the folders under main_folder down to max_depth levels (1 = only the folders
+# directly inside it) in one concurrent scandir walk, as (folder name, path) pairs for
+# the folders whose name contains key_string
+def index_folders(main_folder, max_depth=1, key_string=''):
+    folders = []
+    if max_depth < 1:
+        return folders
+    for listing in walk_folders(main_folder, max_depth=max_depth - 1):
+        folders.extend((entry.name, entry.path) for entry in listing.dirs if key_string in entry.name)
+    return folders
+
 # Generate a folder list based on the main folder
-def generate_folder_list(main_folder, key_string):
-    folder_list = {}
-    for root, dirs, files in os.walk(main_folder,max_depth=1):
-        for dir in dirs:
-            if key_string in dir:
-                folder_list[dir] = os.path.join(root, dir)
-    return folder_list
+def generate_folder_list(main_folder, key_string, max_depth=1):
+    return {name: path for name, path in index_folders(main_folder, max_depth, key_string)}
+
+# True unless the match of a key at name[start:end] is really part of a longer number,
+# so PRJ1 doesn't match PRJ12 and 45 doesn't match 2045
+def whole_number_match(name, start, end):
+    if end < len(name) and name[end].isdigit() and name[end - 1].isdigit():
+        return False
+    return not (start > 0 and name[start - 1].isdigit() and name[start].isdigit())
+
+# Matches every key against every folder name at once, returning {key: [paths of the
+# folders whose name contains it]}. With pyahocorasick installed the keys go into one
+# Aho-Corasick automaton and each name is scanned once however many keys there are.
+# Without it, every substring of a name that is as long as some key is looked up in a set
+def match_keys_to_folders(keys, folders, use_automaton=True):
+    keys = {key for key in keys if key}
+    matches = {}
+    if not keys:
+        return matches
+    if use_automaton and ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for key in keys:
+            automaton.add_word(key, key)
+        automaton.make_automaton()
+        for name, path in folders:
+            found = {key for end, key in automaton.iter(name) if whole_number_match(name, end + 1 - len(key), end + 1)}
+            for key in found:
+                matches.setdefault(key, []).append(path)
+    else:
+        lengths = sorted({len(key) for key in keys})
+        for name, path in folders:
+            found = {name[i:i + n] for n in lengths for i in range(len(name) - n + 1)
+                     if name[i:i + n] in keys and whole_number_match(name, i, i + n)}
+            for key in found:
+                matches.setdefault(key, []).append(path)
+    return matches
 
 # Find .docx files in the specific folder
 def find_docx_files(folder_path):
-    return [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.docx')]
+    return [entry.path for entry in walk(folder_path, ['.docx'], max_depth=0)]
+
+def docx_entry(entry):
+    stat = entry.stat()
+    return entry.path, stat.st_mtime, stat.st_ctime, stat.st_size
+
+# .docx files in a folder as (path, mtime, ctime, size), stat'd once while listing the folder
+def find_docx_entries(folder_path):
+    return [docx_entry(entry) for entry in walk(folder_path, ['.docx'], max_depth=0, stat=True)]
 
-# Finds the newest Word file based on creation time
+# find_docx_entries for many folders at once, listed concurrently: {folder path: entries}
+def list_docx_folders(folder_paths):
+    return {listing.path: [docx_entry(entry) for entry in listing.files if entry.name.lower().endswith('.docx')]
+            for listing in walk_folders(folder_paths, max_depth=0, stat=True, stat_extensions=['.docx'])}
+
+# Finds the newest Word file based on creation time. Takes paths, or the
+# (path, mtime, ctime, size) entries from find_docx_entries which need no more stat calls
 def sort_word_files(docx_files):
+    if isinstance(docx_files[0], tuple):
+        return max(docx_files, key=lambda docx_entry: docx_entry[2])[0]
     return max(docx_files, key=os.path.getctime)
 
-# Extracts values from a Word file based on the regex pattern
-def extract_values_from_word(word_file_path, regex_pattern):
+# Times match_keys_to_folders on synthetic register keys and project folder names
+def benchmark_key_matching(n_keys=50_000, n_folders=200_000):
+    keys = [f'PRJ{i:06d}' for i in range(0, n_keys * 4, 4)]
+    folders = [(f'PRJ{i:06d}_{"site" if i % 3 else "archive"}_{i % 97}', f'/archive/PRJ{i:06d}') for i in range(n_folders)]
+    for name, use_automaton in (('aho-corasick', True), ('substring set', False)):
+        if use_automaton and ahocorasick is None:
+            continue
+        start = time.perf_counter()
+        matches = match_keys_to_folders(keys, folders, use_automaton)
+        print(f"{name:<14} {time.perf_counter() - start:6.2f}s  {len(keys)} keys, {len(folders)} folders, "
+              f"{len(matches)} keys matched")
+
+# Text of a w:p element, the same as python-docx's Paragraph.text: runs and hyperlinks
+# that are direct children of the paragraph, with tabs and line breaks as \t and \n
+def paragraph_text(paragraph):
+    parts = []
+    for child in paragraph:
+        if child.tag == w_r:
+            runs = (child,)
+        elif child.tag == w_hyperlink:
+            runs = child.iterfind(w_r)
+        else:
+            continue
+        for run in runs:
+            for item in run:
+                if item.tag == w + 't':
+                    parts.append(item.text or '')
+                elif item.tag == w_br:
+                    # page and column breaks have no text
+                    parts.append('\n' if item.get(w_type, 'textWrapping') == 'textWrapping' else '')
+                elif item.tag in run_text:
+                    parts.append(run_text[item.tag])
+    return ''.join(parts)
+
+# The main document part's name in the zip, normally word/document.xml
+def main_document_part(docx_zip):
+    if 'word/document.xml' in docx_zip.namelist():
+        return 'word/document.xml'
+    relationships = ET.fromstring(docx_zip.read('_rels/.rels'))
+    for relationship in relationships:
+        if relationship.get('Type', '').endswith('/officeDocument'):
+            return posixpath.normpath(relationship.get('Target').lstrip('/'))
+    raise KeyError(f"no main document part in {docx_zip.filename}")
+
+# Stream-parses one part of the zip, yielding the text of its top-level paragraphs (and of
+# table cell paragraphs if include_tables) in document order. Each top-level element is
+# cleared once it has been read, so memory doesn't grow with the size of the document
+def iter_part_paragraphs(docx_zip, part_name, include_tables=False):
+    stack = []
+    with docx_zip.open(part_name) as part:
+        for event, elem in ET.iterparse(part, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem.tag)
+                continue
+            stack.pop()
+            if elem.tag == w_p:
+                if stack == [w_document, w_body] or stack == [w_hdr] or stack == [w_ftr]:
+                    yield paragraph_text(elem)
+                elif include_tables and stack[-1] == w_tc and w_r not in stack:
+                    yield paragraph_text(elem)
+            if len(stack) == 2 and stack[1] == w_body or len(stack) == 1:
+                elem.clear()
+
+# Yields the text of each paragraph in a .docx without building python-docx's object
+# model: only the XML parts needed are read, straight from the zip. By default this is
+# the same paragraphs as Document.paragraphs (the body, not tables); include_tables adds
+# table cells in document order and include_headers adds header and footer paragraphs
+# after the body. Stop iterating whenever you have what you need
+def iter_docx_paragraphs(word_file_path, include_tables=False, include_headers=False):
+    with zipfile.ZipFile(word_file_path) as docx_zip:
+        yield from iter_part_paragraphs(docx_zip, main_document_part(docx_zip), include_tables)
+        if include_headers:
+            for part_name in sorted(n for n in docx_zip.namelist() if re.fullmatch(r'word/(header|footer)\d*\.xml', n)):
+                yield from iter_part_paragraphs(docx_zip, part_name, include_tables)
+
+# Extracts values from a Word file based on the regex pattern. Stops reading the
+# document as soon as max_matches values have been found
+def extract_values_from_word(word_file_path, regex_pattern, max_matches=None, include_tables=False, include_headers=False):
+    values = []
+    with closing(iter_docx_paragraphs(word_file_path, include_tables, include_headers)) as paragraphs:
+        for text in paragraphs:
+            matches = re.findall(regex_pattern, text)
+            if matches:
+                values.extend(matches)
+                if max_matches and len(values) >= max_matches:
+                    return values[:max_matches]
+    return values
+
+# Looks for every named pattern in one pass over the document, returning {name: [values]}.
+# Stops reading once every pattern has max_matches values
+def extract_named_values(word_file_path, named_patterns, max_matches=None, include_tables=False, include_headers=False):
+    values = {name: [] for name in named_patterns}
+    searching = dict(named_patterns)
+    with closing(iter_docx_paragraphs(word_file_path, include_tables, include_headers)) as paragraphs:
+        for text in paragraphs:
+            for name, pattern in list(searching.items()):
+                matches = re.findall(pattern, text)
+                if matches:
+                    values[name].extend(matches)
+                    if max_matches and len(values[name]) >= max_matches:
+                        values[name] = values[name][:max_matches]
+                        del searching[name]
+            if not searching:
+                break
+    return values
+
+# The original python-docx version, kept for comparison
+def extract_values_with_python_docx(word_file_path, regex_pattern):
     doc = Document(word_file_path)
     values = []
     for para in doc.paragraphs:
@@ -41,53 +242,223 @@ def extract_values_from_word(word_file_path, regex_pattern):
             values.extend(matches)
     return values
 
+# Times the streaming extractor against python-docx over up to limit .docx files under
+# folder, and checks both find the same values
+def benchmark_extraction(folder, pattern=regex_pattern, limit=200):
+    docx_files = sorted(entry.path for entry in walk(folder, ['.docx']))[:limit]
+    results = {}
+    for name, extract in (('python-docx', extract_values_with_python_docx), ('streaming', extract_values_from_word)):
+        if extract is extract_values_with_python_docx and Document is None:
+            continue
+        start = time.perf_counter()
+        results[name] = [extract(f, pattern) for f in docx_files]
+        seconds = time.perf_counter() - start
+        print(f"{name:<12} {len(docx_files) / seconds if seconds else 0:8.1f} docs/s")
+    if len(results) == 2:
+        mismatches = sum(a != b for a, b in zip(*results.values()))
+        print(f"{len(docx_files)} documents, {mismatches} with different matches")
+
+# Runs once in each worker process: compile the patterns there rather than per document
+def init_worker(named_patterns, options=None):
+    global compiled_patterns, extraction_options
+    compiled_patterns = {name: re.compile(pattern) for name, pattern in named_patterns.items()}
+    extraction_options = options or {}
+
+# Worker: scrape one document, returning (row index, {name: values found}, error message)
+def scrape_document(index, word_file_path):
+    try:
+        return index, extract_named_values(word_file_path, compiled_patterns, **extraction_options), ''
+    except Exception as e:
+        return index, {}, f"{word_file_path}: {e}"
+
+# Finds the newest .docx across a row's project folders as a (path, mtime, ctime, size)
+# entry, or None. Folder listings are kept in docx_listings so a folder shared by
+# several rows is only listed once
+def find_newest_docx(key_folders, row, docx_listings):
+    docx_entries = []
+    for folder_path in key_folders.get(row['your_key_here'], []):
+        if folder_path not in docx_listings:
+            docx_listings[folder_path] = find_docx_entries(folder_path)
+        docx_entries.extend(docx_listings[folder_path])
+    return max(docx_entries, key=lambda docx_entry: docx_entry[2]) if docx_entries else None
+
+# Cache of the values found in each document, so a rerun only opens documents that have
+# changed (or that were scraped with different patterns/options) since the last run
+def open_extraction_cache(cache_path):
+    connection = sqlite3.connect(cache_path)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS extraction_cache ("
+        "filepath TEXT, pattern_hash TEXT, size INTEGER, mtime REAL, matches TEXT, "
+        "PRIMARY KEY (filepath, pattern_hash))"
+    )
+    return connection
+
+# cached documents per commit, so an interrupted run keeps what it has scraped so far
+cache_commit_size = 500
+
+def cache_path_for(scraped_csv):
+    return os.path.splitext(scraped_csv)[0] + '_cache.sqlite'
+
+# Identifies the pattern set and extraction options the cached values were found with
+def pattern_set_hash(named_patterns, options):
+    return hashlib.sha1(json.dumps([named_patterns, options], sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_cached_values(connection, docx_entry, pattern_hash):
+    path, mtime, ctime, size = docx_entry
+    found = connection.execute(
+        "SELECT matches FROM extraction_cache WHERE filepath = ? AND pattern_hash = ? AND size = ? AND mtime = ?",
+        (path, pattern_hash, size, mtime),
+    ).fetchone()
+    return json.loads(found[0]) if found else None
+
+def store_cached_values(connection, docx_entry, pattern_hash, values):
+    path, mtime, ctime, size = docx_entry
+    connection.execute(
+        "INSERT OR REPLACE INTO extraction_cache VALUES (?, ?, ?, ?, ?)",
+        (path, pattern_hash, size, mtime, json.dumps(values)),
+    )
+
 # Prepare a scraped row object
-def initialize_scraped_row(row):
-    return {
-        'your_key_here': row['your_key_here'],
-        'error_message': '',
-        'your_value_here': row.get('your_value_here', '')
-    }
+def initialize_scraped_row(row, pattern_names=('your_value_here',)):
+    scraped_row = {'your_key_here': row['your_key_here'], 'error_message': ''}
+    for name in pattern_names:
+        scraped_row[name] = row.get(name, '')
+    return scraped_row
+
+# Fill in a scraped row from the {name: values} found in its document
+def fill_scraped_row(scraped_row, values):
+    for name, extracted_values in values.items():
+        if extracted_values:
+            scraped_row[name] = ', '.join(extracted_values)
 
 # Write a row to the output CSV
 def write_to_csv(scraped_row, writer):
     print(f"Writing to CSV for {scraped_row['your_key_here']}")
     writer.writerow(scraped_row)
 
-# Main logic for scraping and saving data
-def scrape_and_save(input_csv, scraped_csv, key_string, main_folder):
+# Main logic for scraping and saving data. Documents are scraped across a pool of worker
+# processes; rows are written by this process only, in input order, as soon as every
+# row before them has finished. named_patterns is {output column: regex} (or a single
+# regex for the your_value_here column); max_matches, include_tables and include_headers
+# are passed through to extract_named_values. A row's project folders are those, down to
+# max_depth levels below main_folder, whose name contains its key. Values found are cached
+# in cache_path (default <scraped csv>_cache.sqlite, use_cache=False to turn it off)
+def scrape_and_save(input_csv, scraped_csv, key_string, main_folder, workers=None, named_patterns=None,
+                    max_matches=None, include_tables=False, include_headers=False, max_depth=1,
+                    cache_path=None, use_cache=True):
+    named_patterns = named_patterns or patterns
+    if isinstance(named_patterns, str):
+        named_patterns = {'your_value_here': named_patterns}
     filtered_rows = filter_csv(input_csv, key_string)
-    folder_list = generate_folder_list(main_folder, key_string)
-    
+    folders = index_folders(main_folder, max_depth, key_string)
+    key_folders = match_keys_to_folders((row['your_key_here'] for row in filtered_rows), folders)
+    docx_listings = list_docx_folders({path for paths in key_folders.values() for path in paths})
+    workers = workers or os.cpu_count() or 1
+    options = {'max_matches': max_matches, 'include_tables': include_tables, 'include_headers': include_headers}
+    pattern_hash = pattern_set_hash(named_patterns, options)
+    cache = open_extraction_cache(cache_path or cache_path_for(scraped_csv)) if use_cache else None
+    cache_hits = 0
+
+    # check before opening, opening in append mode creates the file
+    new_file = not os.path.exists(scraped_csv) or os.path.getsize(scraped_csv) == 0
     with open(scraped_csv, 'a', newline='', encoding='utf-8') as outfile:
-        fieldnames = ['your_key_here', 'your_value_here', 'error_message']
+        fieldnames = ['your_key_here', *named_patterns, 'error_message']
         writer = csv.DictWriter(outfile, fieldnames=fieldnames)
         
-        if not os.path.exists(scraped_csv):
+        if new_file:
             writer.writeheader()
 
-        for row in filtered_rows:
-            scraped_row = initialize_scraped_row(row)
-            specific_folder_path = folder_list.get(row['your_key_here'], None)
-            
-            if specific_folder_path:
-                docx_files = find_docx_files(specific_folder_path)
-                if docx_files:
-                    newest_file = sort_word_files(docx_files)
-                    
-                    # Annotated Regex Pattern: Modify this pattern as needed
-                    regex_pattern = r'your_regex_here'
-                    
-                    extracted_values = extract_values_from_word(newest_file, regex_pattern)
-                    if extracted_values:
-                        scraped_row['your_value_here'] = ', '.join(extracted_values)
-            
-            write_to_csv(scraped_row, writer)
+        scraped_rows = {}  # index -> row, until it has been written
+        documents = {}  # index -> docx entry, for rows still being scraped
+        finished = set()
+        next_to_write = 0
+        uncommitted = 0
+
+        def write_finished():
+            nonlocal next_to_write
+            while next_to_write in finished:
+                finished.discard(next_to_write)
+                write_to_csv(scraped_rows.pop(next_to_write), writer)
+                next_to_write += 1
+
+        def collect(done):
+            nonlocal uncommitted
+            for future in done:
+                index, values, error = future.result()
+                fill_scraped_row(scraped_rows[index], values)
+                scraped_rows[index]['error_message'] = error
+                docx_entry = documents.pop(index)
+                if cache is not None and not error:
+                    store_cached_values(cache, docx_entry, pattern_hash, values)
+                    uncommitted += 1
+                    if uncommitted >= cache_commit_size:
+                        cache.commit()
+                        uncommitted = 0
+                finished.add(index)
+            write_finished()
+
+        # spawned rather than forked: this process already holds the cache's sqlite connection and
+        # the walker's threads, neither of which is safe to copy into a forked child
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(named_patterns, options),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            pending = set()
+            for index, row in enumerate(filtered_rows):
+                scraped_rows[index] = initialize_scraped_row(row, named_patterns)
+                newest_file = find_newest_docx(key_folders, row, docx_listings)
+                cached_values = load_cached_values(cache, newest_file, pattern_hash) if cache is not None and newest_file else None
+                if not newest_file or cached_values is not None:
+                    if cached_values is not None:
+                        fill_scraped_row(scraped_rows[index], cached_values)
+                        cache_hits += 1
+                    finished.add(index)
+                    write_finished()
+                    continue
+                # keep a bounded number of documents queued so memory doesn't grow with the archive
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                documents[index] = newest_file
+                pending.add(executor.submit(scrape_document, index, newest_file[0]))
+            collect(wait(pending).done)
+
+    if cache is not None:
+        cache.commit()
+        cache.close()
+        print(f"{cache_hits} documents unchanged since the last run, taken from the cache")
 
 if __name__ == '__main__':
-    input_csv = input("Enter the path of the input CSV: ")
-    scraped_csv = input("Enter the path of the output CSV: ")
-    key_string = input("Enter the key string to look for: ")
-    main_folder = input("Enter the main folder path: ")
+    parser = argparse.ArgumentParser(description="Scrape values matching a regex from the newest .docx in each project folder.")
+    parser.add_argument('input_csv', nargs='?')
+    parser.add_argument('scraped_csv', nargs='?')
+    parser.add_argument('key_string', nargs='?')
+    parser.add_argument('main_folder', nargs='?')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--max-matches', type=int, help="stop reading a document once this many values are found")
+    parser.add_argument('--tables', action='store_true', help="search paragraphs in tables too")
+    parser.add_argument('--headers', action='store_true', help="search headers and footers too")
+    parser.add_argument('--pattern', action='append', metavar='NAME=REGEX',
+                        help="a named pattern, repeat for several (default: the regex_pattern at the top of the script)")
+    parser.add_argument('--cache', help="cache file (default: <output csv>_cache.sqlite)")
+    parser.add_argument('--no-cache', action='store_true', help="re-read every document")
+    parser.add_argument('--depth', type=int, default=1, help="how many folder levels below the main folder to search (default 1)")
+    parser.add_argument('--benchmark-matching', action='store_true', help="time matching 50k keys against 200k folder names")
+    parser.add_argument('--benchmark', metavar='FOLDER', help="time python-docx against the streaming extractor on a folder of .docx")
+    args = parser.parse_args()
+
+    if args.benchmark or args.benchmark_matching:
+        if args.benchmark:
+            benchmark_extraction(args.benchmark)
+        if args.benchmark_matching:
+            benchmark_key_matching()
+        raise SystemExit
+
+    # anything not given on the command line is asked for
+    input_csv = args.input_csv or input("Enter the path of the input CSV: ")
+    scraped_csv = args.scraped_csv or input("Enter the path of the output CSV: ")
+    key_string = args.key_string or input("Enter the key string to look for: ")
+    main_folder = args.main_folder or input("Enter the main folder path: ")
     
-    scrape_and_save(input_csv, scraped_csv, key_string, main_folder)
\ No newline at end of file
+    named_patterns = dict(pattern.split('=', 1) for pattern in args.pattern) if args.pattern else None
+    scrape_and_save(input_csv, scraped_csv, key_string, main_folder, args.workers, named_patterns,
+                    max_matches=args.max_matches, include_tables=args.tables, include_headers=args.headers,
+                    max_depth=args.depth, cache_path=args.cache, use_cache=not args.no_cache)
\ No newline at end of file
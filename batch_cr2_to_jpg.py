@@ -1,25 +1,189 @@
+import io
 import os
+import sys
+import time
+import argparse
+import multiprocessing
+import tempfile
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import rawpy
 import imageio
+from PIL import Image
+from fast_walk import walk_folders
 
-def convert_cr2_files_in_directory(input_directory):
+# Quality tiers, fastest first. 'preview' writes the JPEG the camera embedded in the
+# CR2 without decoding the raw data at all, 'half' decodes at half resolution (which
+# skips demosaicing), 'fast' uses a cheap linear demosaic and 'full' is the default
+# rawpy postprocess. jpeg_quality and max_size (longest edge in pixels) can be set per
+# tier; None keeps the preview untouched / the image at full size. 'full' has no settings
+# so it writes exactly what the script always has (imageio's default jpeg encoding).
+quality_tiers = {
+    'preview': {'jpeg_quality': None, 'max_size': None},
+    'half': {'jpeg_quality': 90, 'max_size': None},
+    'fast': {'jpeg_quality': 92, 'max_size': None},
+    'full': {'jpeg_quality': None, 'max_size': None},
+}
 
-    for root, dirs, files in os.walk(input_directory):
-        for filename in files:
+def find_cr2_files(input_directory, output_directory=None):
+    # yields (cr2 path, jpg path) as the walk finds them. Output goes in a 'converted'
+    # sub-folder next to each file, or mirrors the folder structure under output_directory.
+    # Folders are listed concurrently, so on a network share the walk keeps ahead of the pool
+    skip = None if output_directory else (lambda name: name == 'converted')
+    for listing in walk_folders(input_directory, skip=skip):
+        root = listing.path
+        if output_directory:
+            output_folder = os.path.join(output_directory, os.path.relpath(root, input_directory))
+        else:
+            output_folder = os.path.join(root, 'converted')
+        for entry in listing.files:
+            filename = entry.name
             if filename.endswith('.CR2') or filename.endswith('.cr2'):
-                cr2_file_path = os.path.join(root, filename)
-                output_folder = os.path.join(root, 'converted')
-                os.makedirs(output_folder, exist_ok=True)
+                cr2_file_path = entry.path
                 output_jpg_path = os.path.join(output_folder, os.path.splitext(filename)[0] + '.jpg')
-                convert_cr2_to_jpg(cr2_file_path, output_jpg_path)
-                print("Converted:", cr2_file_path)  # Print progress indicator
+                yield cr2_file_path, output_jpg_path
 
-def convert_cr2_to_jpg(cr2_file_path, output_jpg_path):
+def is_up_to_date(cr2_file_path, output_jpg_path):
+    # a previous run already converted this file and the CR2 hasn't changed since
+    try:
+        return os.path.getmtime(output_jpg_path) >= os.path.getmtime(cr2_file_path)
+    except OSError:
+        return False
+
+def convert_one(paths, tier='full', jpeg_quality=None, max_size=None):
+    # worker: convert a single file, returning (cr2 path, seconds taken, error or None)
+    cr2_file_path, output_jpg_path = paths
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(output_jpg_path), exist_ok=True)
+        convert_cr2_to_jpg(cr2_file_path, output_jpg_path, tier, jpeg_quality, max_size)
+    except Exception as e:
+        return cr2_file_path, time.perf_counter() - start, str(e)
+    return cr2_file_path, time.perf_counter() - start, None
+
+def convert_cr2_files_in_directory(input_directory, workers=None, overwrite=False, output_directory=None, limit=None,
+                                   tier='full', jpeg_quality=None, max_size=None):
+    # converts every CR2 under input_directory across a pool of worker processes.
+    # Files are submitted as the walk finds them, so listing and decoding overlap,
+    # and files whose jpg is newer than the CR2 are skipped unless overwrite is set.
+    # tier picks a quality_tiers entry; jpeg_quality and max_size override its settings
+    workers = workers or os.cpu_count() or 1
+    converted = skipped = failed = 0
+    pending = set()
+
+    def report(done):
+        nonlocal converted, failed
+        for future in done:
+            cr2_file_path, seconds, error = future.result()
+            if error:
+                failed += 1
+                print(f"Failed: {cr2_file_path} ({error})")
+            else:
+                converted += 1
+                print(f"Converted: {cr2_file_path} ({seconds:.1f}s)")  # Print progress indicator
+
+    start = time.perf_counter()
+    # spawned rather than forked: rawpy uses OpenMP, which can deadlock in a forked child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for paths in islice(find_cr2_files(input_directory, output_directory), limit):
+            if not overwrite and is_up_to_date(*paths):
+                skipped += 1
+                continue
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                report(done)
+            pending.add(executor.submit(convert_one, paths, tier, jpeg_quality, max_size))
+        report(wait(pending).done)
+    seconds = time.perf_counter() - start
+
+    print(f"{converted} converted, {skipped} already up to date, {failed} failed "
+          f"in {seconds:.1f}s ({converted / seconds if seconds else 0:.2f} images/s)")
+    return converted, seconds
+
+def convert_cr2_to_jpg(cr2_file_path, output_jpg_path, tier='full', jpeg_quality=None, max_size=None):
+    # writes to a temporary file that is moved into place once it's complete, so a killed
+    # worker or a failed save (e.g. disk full) never leaves a truncated jpg behind that
+    # later runs would skip as up to date
+    temp_jpg_path = output_jpg_path + '.tmp'
+    try:
+        save_cr2_as_jpg(cr2_file_path, temp_jpg_path, tier, jpeg_quality, max_size)
+        os.replace(temp_jpg_path, output_jpg_path)
+    except BaseException:
+        if os.path.exists(temp_jpg_path):
+            os.remove(temp_jpg_path)
+        raise
+
+def save_cr2_as_jpg(cr2_file_path, output_jpg_path, tier='full', jpeg_quality=None, max_size=None):
+    settings = quality_tiers[tier]
+    jpeg_quality = jpeg_quality or settings['jpeg_quality']
+    max_size = max_size or settings['max_size']
 
     with rawpy.imread(cr2_file_path) as raw:
-        rgb = raw.postprocess()
-        imageio.imsave(output_jpg_path, rgb)
+        if tier == 'preview':
+            try:
+                thumb = raw.extract_thumb()
+            except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+                thumb = None
+            if thumb is not None and thumb.format == rawpy.ThumbFormat.JPEG:
+                if not jpeg_quality and not max_size:
+                    # straight copy of the embedded jpeg, no decoding at all
+                    with open(output_jpg_path, 'wb') as f:
+                        f.write(thumb.data)
+                    return
+                rgb = Image.open(io.BytesIO(thumb.data))
+            elif thumb is not None:
+                rgb = thumb.data
+            else:
+                # no usable preview in this file, fall back to a half-size decode
+                rgb = raw.postprocess(half_size=True)
+        elif tier == 'half':
+            rgb = raw.postprocess(half_size=True)
+        elif tier == 'fast':
+            rgb = raw.postprocess(demosaic_algorithm=rawpy.DemosaicAlgorithm.LINEAR)
+        else:
+            rgb = raw.postprocess()
+
+    if not max_size and not jpeg_quality:
+        imageio.imsave(output_jpg_path, rgb, format='JPEG')
+        return
+    image = rgb if isinstance(rgb, Image.Image) else Image.fromarray(rgb)
+    if max_size:
+        image.thumbnail((max_size, max_size))
+    image.save(output_jpg_path, 'JPEG', quality=jpeg_quality or 75)
+
+def benchmark_workers(input_directory, worker_counts=None, limit=50, tier='full'):
+    # converts the same limit files into a temporary folder at each worker count
+    # and reports images/sec, so the pool can be sized for the machine
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count() or 1})
+    results = {}
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            converted, seconds = convert_cr2_files_in_directory(
+                input_directory, workers, overwrite=True, output_directory=temp_dir, limit=limit, tier=tier)
+        results[workers] = converted / seconds if seconds else 0.0
+    print("workers  images/s")
+    for workers, rate in results.items():
+        print(f"{workers:>7}  {rate:8.2f}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert every CR2 in a folder (and its sub-folders) to jpg.")
+    parser.add_argument('input_directory', nargs='?', help="folder containing CR2 files")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--overwrite', action='store_true', help="re-convert files whose jpg is already up to date")
+    parser.add_argument('--output-directory', help="write jpgs here instead of 'converted' sub-folders")
+    parser.add_argument('--tier', choices=list(quality_tiers), default='full',
+                        help="preview = embedded jpeg (fastest), half = half-size decode, fast = linear demosaic, "
+                             "full = full quality (default)")
+    parser.add_argument('--jpeg-quality', type=int, help="jpeg quality 1-95 (default: set by the tier)")
+    parser.add_argument('--max-size', type=int, help="shrink so the longest edge is at most this many pixels")
+    parser.add_argument('--benchmark', action='store_true', help="report images/sec against worker count")
+    args = parser.parse_args()
 
-# Example usage:
-input_directory = input("Enter the path to the directory containing CR2 files: ")
-convert_cr2_files_in_directory(input_directory)
\ No newline at end of file
+    # Example usage:
+    input_directory = args.input_directory or input("Enter the path to the directory containing CR2 files: ")
+    if args.benchmark:
+        benchmark_workers(input_directory, tier=args.tier)
+        sys.exit()
+    convert_cr2_files_in_directory(input_directory, args.workers, args.overwrite, args.output_directory,
+                                   tier=args.tier, jpeg_quality=args.jpeg_quality, max_size=args.max_size)
@@ -0,0 +1,705 @@
+import argparse
+import csv
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows, peak RSS is left out there
+    resource = None
+
+try:
+    import tifffile
+except ImportError:  # only needed to generate the GeoTIFFs and raw files
+    tifffile = None
+
+# British National Grid as ArcGIS writes it in a .prj sidecar
+bng_wkt = ('PROJCS["British_National_Grid",GEOGCS["GCS_OSGB_1936",DATUM["D_OSGB_1936",'
+           'SPHEROID["Airy_1830",6377563.396,299.3249646]],PRIMEM["Greenwich",0.0],'
+           'UNIT["Degree",0.0174532925199433]],PROJECTION["Transverse_Mercator"],'
+           'PARAMETER["False_Easting",400000.0],PARAMETER["False_Northing",-100000.0],'
+           'PARAMETER["Central_Meridian",-2.0],PARAMETER["Scale_Factor",0.9996012717],'
+           'PARAMETER["Latitude_Of_Origin",49.0],UNIT["Meter",1.0]]')
+
+# GeoKeyDirectory: projected, PixelIsArea, EPSG:27700
+bng_geokeys = (1, 1, 0, 3, 1024, 0, 1, 1, 1025, 0, 1, 1, 3072, 0, 1, 27700)
+
+# fixed modified times for generated documents, so the scraper's cache keys are the same on every run
+document_mtime = 1_700_000_000
+
+
+# Synthetic data generators. Each takes an empty folder, a seed and its size
+# parameters, fills the folder and returns a manifest of what it wrote
+# (counts and bytes), which the runs use for throughput.
+
+def folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names)
+
+
+def write_ngr_register(folder, seed=0, rows=500_000):
+    """A site register CSV with an NGR column at mixed precisions and some junk refs, for NGR_to_E_N."""
+    from NGR_to_E_N import write_random_register
+
+    write_random_register(os.path.join(folder, "register.csv"), rows, seed)
+    return {"rows": rows, "bytes": folder_bytes(folder)}
+
+
+messy_columns = ["Site ID", "Site Name", "NGR", "Cost £", "Depth (m)-max", "Notes #", "Recorder's name"]
+messy_names = ["Château field", "Smith's farm", 'Long "Barrow"', "Bank, ditch and pit", "Moor End", "Øster Holm"]
+messy_notes = ["fill of ditch", 'it\'s "disturbed"', "line one\nline two", "", "café floor, burnt", "50% sampled"]
+messy_recorders = ["J. Smith", "Zoë Brown", "O'Neill", "R. Müller", ""]
+
+
+def write_messy_csvs(folder, seed=0, files=12, rows=20_000):
+    """CSVs the way they turn up from other people's exports, for the cleaner and the concatenator.
+
+    Files cycle through UTF-8, UTF-8 with a BOM and cp1252, and CRLF / LF line
+    endings. Names and headers have spaces and symbols, values have quotes,
+    commas, line breaks and accented characters, and every fourth file has a
+    different set of columns.
+    """
+    from NGR_to_E_N import make_random_ngrs
+
+    encodings = ["utf-8", "utf-8-sig", "cp1252"]
+    rng = np.random.default_rng(seed)
+    for i in range(files):
+        columns = list(messy_columns)
+        if i % 4 == 3:
+            columns.remove("Depth (m)-max")
+            columns.append("Period")
+        values = {
+            "Site ID": [f"S{i:02d}-{n}" for n in range(rows)],
+            "Site Name": rng.choice(messy_names, rows),
+            "NGR": make_random_ngrs(rows, seed + i),
+            "Cost £": [f"£{cost:,.2f}" for cost in rng.uniform(0, 250_000, rows)],
+            "Depth (m)-max": [f"{depth:.2f}" for depth in rng.uniform(0, 4, rows)],
+            "Notes #": rng.choice(messy_notes, rows),
+            "Recorder's name": rng.choice(messy_recorders, rows),
+            "Period": rng.choice(["Roman", "Medieval", "Post-medieval", "Unknown"], rows),
+        }
+        path = os.path.join(folder, f"Site register #{i} ({2015 + i % 8}).csv")
+        with open(path, "w", newline="", encoding=encodings[i % 3]) as f:
+            writer = csv.writer(f, lineterminator="\r\n" if i % 2 else "\n")
+            writer.writerow(columns)
+            writer.writerows(zip(*(values[column] for column in columns)))
+    return {"files": files, "rows": files * rows, "bytes": folder_bytes(folder)}
+
+
+def write_uniform_csvs(folder, seed=0, files=6, rows=200_000):
+    """Clean UTF-8 CSVs that all share a header (csv_concatenator's own sample data)."""
+    from csv_concatenator import write_sample_csvs
+
+    write_sample_csvs(folder, files, rows)
+    return {"files": files, "rows": files * rows, "bytes": folder_bytes(folder)}
+
+
+def write_folder_tree(folder, seed=0, depth=4, fanout=4, files_per_folder=8):
+    """A tree of empty files, fanout sub-folders per level (fast_walk's own benchmark tree)."""
+    from fast_walk import make_tree
+
+    files = make_tree(folder, depth, fanout, files_per_folder)
+    return {"files": files, "folders": sum(fanout ** level for level in range(depth + 1)), "bytes": 0}
+
+
+def write_geotiffs(folder, seed=0, tiles=500, pixels=256, per_folder=100):
+    """Georeferenced 1km tiles in per_folder-sized sheet folders, each with a .prj sidecar, for the cataloguer.
+
+    Every tenth tile is a PNG with a world file instead of a GeoTIFF. An
+    "admin" folder holds extra tiles that the default skip keywords leave out,
+    so they aren't counted.
+    """
+    if tifffile is None:
+        raise ImportError("generating GeoTIFFs needs tifffile")
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    scale = 1000 / pixels
+
+    def write_tile(path, minx, maxy):
+        data = rng.integers(0, 255, (pixels, pixels), dtype=np.uint8)
+        stem, ext = os.path.splitext(path)
+        if ext == ".png":
+            Image.fromarray(data).save(path)
+            with open(stem + ".pgw", "w") as f:
+                f.write(f"{scale}\n0.0\n0.0\n{-scale}\n{minx + scale / 2}\n{maxy - scale / 2}\n")
+        else:
+            tifffile.imwrite(path, data, extratags=[
+                (33550, "d", 3, (scale, scale, 0.0), True),
+                (33922, "d", 6, (0.0, 0.0, 0.0, minx, maxy, 0.0), True),
+                (34735, "H", len(bng_geokeys), bng_geokeys, True),
+            ])
+        with open(stem + ".prj", "w") as f:
+            f.write(bng_wkt)
+
+    for i in range(tiles):
+        sheet = os.path.join(folder, f"sheet_{i // per_folder:03d}")
+        os.makedirs(sheet, exist_ok=True)
+        ext = ".png" if i % 10 == 9 else ".tif"
+        write_tile(os.path.join(sheet, f"tile_{i:06d}{ext}"), 400000 + (i % 500) * 1000, 101000 + (i // 500) * 1000)
+    admin = os.path.join(folder, "admin")
+    os.makedirs(admin)
+    for i in range(tiles // 20):
+        write_tile(os.path.join(admin, f"old_{i:06d}.tif"), 400000 + i * 1000, 101000)
+    return {"files": tiles, "bytes": folder_bytes(folder)}
+
+
+docx_content_types = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>')
+docx_relationships = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>')
+site_names = ["north_field", "church_lane", "quarry", "manor_farm", "bypass"]
+surnames = ["Smith", "Brown", "Müller", "Jones", "Nowak"]
+filler_words = ["trench", "ditch", "fill", "context", "pottery", "sherd", "Roman", "medieval", "cut", "layer",
+                "natural", "subsoil", "topsoil", "posthole", "pit", "recorded", "excavated", "north", "east", "of"]
+
+
+def docx_paragraph(*runs):
+    text = "".join(f'<w:r><w:t xml:space="preserve">{escape(run)}</w:t></w:r>' for run in runs)
+    return f"<w:p>{text}</w:p>"
+
+
+def docx_document(paragraphs, author, postcode, key):
+    """document.xml for a report, with the values to find split across runs the way Word saves them."""
+    body = list(paragraphs)
+    middle = len(body) // 2
+    body.insert(middle, docx_paragraph("Auth", f"or: {author}"))
+    body.insert(middle + 1, docx_paragraph("Site postcode: ", postcode))
+    body.append(f"<w:tbl><w:tr><w:tc>{docx_paragraph('Site code')}</w:tc>"
+                f"<w:tc>{docx_paragraph(key)}</w:tc></w:tr></w:tbl>")
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{"".join(body)}<w:sectPr/></w:body></w:document>')
+
+
+def write_docx(path, document_xml, mtime):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", docx_content_types)
+        docx.writestr("_rels/.rels", docx_relationships)
+        docx.writestr("word/document.xml", document_xml)
+    os.utime(path, (mtime, mtime))
+
+
+def write_docx_corpus(folder, seed=0, projects=300, paragraphs=200):
+    """A project archive and register for the scraper.
+
+    archive/ has a PRJnnnnn_<site> folder per project (every tenth project
+    has none) holding a report .docx with an author and postcode to find;
+    every third folder also has an older draft. register.csv lists every
+    project in the scraper's your_column_name_here / your_key_here columns.
+    """
+    rng = np.random.default_rng(seed)
+    archive = os.path.join(folder, "archive")
+    os.makedirs(archive)
+    documents = files = 0
+    with open(os.path.join(folder, "register.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["your_column_name_here", "your_key_here"])
+        for i in range(projects):
+            key = f"PRJ{i:05d}"
+            writer.writerow([key, key])
+            if i % 10 == 9:
+                continue
+            project_folder = os.path.join(archive, f"{key}_{site_names[i % len(site_names)]}")
+            os.makedirs(project_folder)
+            words = rng.choice(filler_words, (paragraphs, 30))
+            body = [docx_paragraph(f"{n + 1}. ", " ".join(line)) for n, line in enumerate(words)]
+            author = f"{surnames[i % len(surnames)]} {i}"
+            postcode = f"AB{i % 90 + 1} {i % 9}CD"
+            if i % 3 == 0:
+                # written first, as the scraper takes the newest file by creation time
+                write_docx(os.path.join(project_folder, f"{key}_draft.docx"),
+                           docx_document(body[:paragraphs // 2], "Draft", postcode, key), document_mtime - 86400)
+                files += 1
+            write_docx(os.path.join(project_folder, f"{key}_report.docx"),
+                       docx_document(body, author, postcode, key), document_mtime + i)
+            documents += 1
+            files += 1
+    return {"projects": projects, "documents": documents, "files": files, "bytes": folder_bytes(folder)}
+
+
+def write_raw_files(folder, seed=0, files=12, height=1024, width=1536):
+    """Small synthetic raw files for batch_cr2_to_jpg.
+
+    Real CR2s can't be made without a camera, so these are minimal DNGs (a
+    12-bit RGGB Bayer mosaic) saved with a .cr2 name; LibRaw identifies raw
+    files by content, so rawpy decodes them the same way. They have no
+    embedded preview, so the preview tier falls back to a half-size decode.
+    """
+    if tifffile is None:
+        raise ImportError("generating raw files needs tifffile")
+    rng = np.random.default_rng(seed)
+    dng_tags = [
+        (50706, "B", 4, (1, 4, 0, 0), True),  # DNGVersion
+        (50707, "B", 4, (1, 1, 0, 0), True),  # DNGBackwardVersion
+        (50708, "s", 0, "Synthetic Camera", True),  # UniqueCameraModel
+        (33421, "H", 2, (2, 2), True),  # CFARepeatPatternDim
+        (33422, "B", 4, (0, 1, 1, 2), True),  # CFAPattern, RGGB
+        (50721, "2i", 9, (1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1), True),  # ColorMatrix1, identity
+        (50717, "I", 1, (4095,), True),  # WhiteLevel
+        (50778, "H", 1, (21,), True),  # CalibrationIlluminant1, D65
+    ]
+    y, x = np.mgrid[0:height, 0:width]
+    for i in range(files):
+        # a smooth gradient with noise, so demosaicing and JPEG encoding have real work to do
+        mosaic = (x * 2 + y + i * 97) % 3000 + rng.integers(0, 1000, (height, width))
+        tifffile.imwrite(os.path.join(folder, f"IMG_{i:04d}.cr2"), mosaic.astype(np.uint16),
+                         photometric=32803, subfiletype=0, extratags=dng_tags)
+    return {"files": files, "bytes": folder_bytes(folder)}
+
+
+# Benchmark runs. Each is called in a fresh process with the generated folder,
+# its manifest, an empty scratch folder for output and the case options, and
+# returns {"items", "unit", "bytes", "failed"} and optionally "seconds" when
+# only part of the call should be timed.
+
+def run_ngr_conversion(folder, manifest, out_dir, workers=1):
+    from NGR_to_E_N import process_csv, process_csv_parallel
+
+    input_csv, output_csv = os.path.join(folder, "register.csv"), os.path.join(out_dir, "converted.csv")
+    if workers == 1:
+        process_csv(input_csv, output_csv)
+    else:
+        process_csv_parallel(input_csv, output_csv, workers)
+    return {"items": manifest["rows"], "unit": "rows", "bytes": manifest["bytes"], "failed": 0}
+
+
+def run_csv_cleaner(folder, manifest, out_dir, workers=1, output_format="csv"):
+    from csv_cleaner_batch_user_input import clean_csv_folder
+
+    summaries = clean_csv_folder(folder, out_dir, workers, overwrite=True, output_format=output_format,
+                                 summary_path=os.path.join(out_dir, "summary.csv"))
+    cleaned = [s for s in summaries if s["status"] == "cleaned"]
+    return {"items": sum(s["rows"] for s in cleaned), "unit": "rows", "bytes": sum(s["bytes_in"] for s in cleaned),
+            "failed": len(summaries) - len(cleaned)}
+
+
+def run_csv_concatenator(folder, manifest, out_dir, output_format="csv"):
+    from csv_concatenator import concatenate_csvs, expand_inputs
+
+    filenames = expand_inputs([folder])
+    if output_format == "csv":
+        concatenate_csvs(filenames, os.path.join(out_dir, "merged.csv"))
+    else:
+        from columnar_output import csv_to_columnar
+
+        csv_to_columnar(filenames, os.path.join(out_dir, f"merged.{output_format}"), output_format)
+    return {"items": manifest["rows"], "unit": "rows", "bytes": manifest["bytes"], "failed": 0}
+
+
+def run_fast_walk(folder, manifest, out_dir, threads=16):
+    from fast_walk import walk
+
+    found = sum(1 for _ in walk(folder, threads=threads, stat=True))
+    return {"items": found, "unit": "files", "bytes": 0, "failed": manifest["files"] - found}
+
+
+def run_docx_extraction(folder, manifest, out_dir, named_patterns=None):
+    from fast_walk import walk
+    from Scrape_Files_in_Folders_For_strings import extract_named_values
+
+    found = documents = 0
+    for entry in walk(os.path.join(folder, "archive"), [".docx"]):
+        values = extract_named_values(entry.path, named_patterns)
+        found += any(values.values())
+        documents += 1
+    return {"items": documents, "unit": "documents", "bytes": manifest["bytes"], "failed": documents - found}
+
+
+def run_scraper(folder, manifest, out_dir, workers=1, named_patterns=None):
+    from Scrape_Files_in_Folders_For_strings import scrape_and_save
+
+    scraped_csv = os.path.join(out_dir, "scraped.csv")
+    scrape_and_save(os.path.join(folder, "register.csv"), scraped_csv, "PRJ", os.path.join(folder, "archive"),
+                    workers, named_patterns, use_cache=False)
+    with open(scraped_csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    found = sum(all(row[name] for name in named_patterns) for row in rows)
+    return {"items": manifest["documents"], "unit": "documents", "bytes": manifest["bytes"],
+            "failed": manifest["documents"] - found}
+
+
+def run_raster_catalogue(folder, manifest, out_dir, threads=16, processes=0):
+    from georaster_catalogue_with_bboxes import catalogue_rasters
+
+    stats = catalogue_rasters(folder, os.path.join(out_dir, "catalogue.gpkg"), threads=threads, processes=processes)
+    summary = stats.summary()
+    return {"items": summary["files_done"], "unit": "files", "bytes": manifest["bytes"],
+            "failed": summary["files_failed"] + manifest["files"] - summary["files_done"]}
+
+
+def run_raster_query(folder, manifest, out_dir, tiles=20_000, queries=100_000, seed=0):
+    import geopandas as gpd
+    from shapely import box, points
+    from raster_catalogue_query import RasterCatalogue
+
+    # the same 1km grid the cataloguer would write for write_geotiffs' tiles
+    i = np.arange(tiles)
+    minx, maxy = 400000 + (i % 500) * 1000, 101000 + (i // 500) * 1000
+    catalogue = RasterCatalogue(gpd.GeoDataFrame(
+        {"filepath": [f"tile_{n:06d}.tif" for n in i]}, geometry=box(minx, maxy - 1000, minx + 1000, maxy),
+        crs="EPSG:27700"))
+    rng = np.random.default_rng(seed)
+    query_points = points(rng.uniform(minx.min(), minx.max() + 1000, queries),
+                          rng.uniform(maxy.min() - 1000, maxy.max(), queries))
+    start = time.perf_counter()
+    matches = catalogue.query_many(query_points)
+    seconds = time.perf_counter() - start
+    return {"items": queries, "unit": "queries", "bytes": 0, "failed": queries - matches["query_index"].nunique(),
+            "seconds": seconds}
+
+
+def run_cr2_to_jpg(folder, manifest, out_dir, workers=1, tier="half"):
+    from batch_cr2_to_jpg import convert_cr2_files_in_directory
+
+    converted, seconds = convert_cr2_files_in_directory(folder, workers, overwrite=True, output_directory=out_dir,
+                                                        tier=tier)
+    return {"items": converted, "unit": "images", "bytes": manifest["bytes"], "failed": manifest["files"] - converted}
+
+
+scraper_patterns = {"author": r"Author: (\w+ \d+)", "postcode": r"[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}"}
+
+# Every benchmark case: the generator and its data parameters (scaled keys are
+# multiplied by --scale), the run and its options, the modules it needs and the
+# option varied for its scaling curve (worker processes or threads).
+cases = {
+    "ngr_to_e_n": {"generate": write_ngr_register, "data": {"rows": 500_000}, "scaled": ["rows"],
+                   "run": run_ngr_conversion, "options": {"workers": 1}, "curve": "workers",
+                   "modules": ["NGR_to_E_N"]},
+    "csv_cleaner": {"generate": write_messy_csvs, "data": {"files": 12, "rows": 20_000}, "scaled": ["rows"],
+                    "run": run_csv_cleaner, "options": {"workers": 1}, "curve": "workers",
+                    "modules": ["csv_cleaner_batch_user_input"]},
+    "csv_cleaner_parquet": {"generate": write_messy_csvs, "data": {"files": 12, "rows": 20_000}, "scaled": ["rows"],
+                            "run": run_csv_cleaner, "options": {"workers": 1, "output_format": "parquet"},
+                            "curve": "workers", "modules": ["csv_cleaner_batch_user_input", "columnar_output"]},
+    "csv_concatenator": {"generate": write_messy_csvs, "data": {"files": 12, "rows": 20_000}, "scaled": ["rows"],
+                         "run": run_csv_concatenator, "options": {}, "curve": None,
+                         "modules": ["csv_concatenator"]},
+    "csv_to_parquet": {"generate": write_uniform_csvs, "data": {"files": 6, "rows": 200_000}, "scaled": ["rows"],
+                       "run": run_csv_concatenator, "options": {"output_format": "parquet"}, "curve": None,
+                       "modules": ["csv_concatenator", "columnar_output"]},
+    "fast_walk": {"generate": write_folder_tree, "data": {"depth": 4, "fanout": 4, "files_per_folder": 8},
+                  "scaled": ["files_per_folder"], "run": run_fast_walk, "options": {"threads": 16},
+                  "curve": "threads", "modules": ["fast_walk"]},
+    "docx_extraction": {"generate": write_docx_corpus, "data": {"projects": 300, "paragraphs": 200},
+                        "scaled": ["projects"], "run": run_docx_extraction,
+                        "options": {"named_patterns": scraper_patterns}, "curve": None,
+                        "modules": ["Scrape_Files_in_Folders_For_strings"]},
+    "scraper": {"generate": write_docx_corpus, "data": {"projects": 300, "paragraphs": 200}, "scaled": ["projects"],
+                "run": run_scraper, "options": {"workers": 1, "named_patterns": scraper_patterns}, "curve": "workers",
+                "modules": ["Scrape_Files_in_Folders_For_strings"]},
+    "raster_catalogue": {"generate": write_geotiffs, "data": {"tiles": 500, "pixels": 256}, "scaled": ["tiles"],
+                         "run": run_raster_catalogue, "options": {"threads": 16}, "curve": "threads",
+                         "modules": ["georaster_catalogue_with_bboxes"]},
+    "raster_query": {"generate": None, "data": {}, "scaled": [], "run": run_raster_query,
+                     "options": {"tiles": 20_000, "queries": 100_000}, "curve": None,
+                     "modules": ["raster_catalogue_query"]},
+    "cr2_to_jpg": {"generate": write_raw_files, "data": {"files": 12, "height": 1024, "width": 1536},
+                   "scaled": ["files"], "run": run_cr2_to_jpg, "options": {"workers": 1, "tier": "half"},
+                   "curve": "workers", "modules": ["batch_cr2_to_jpg"]},
+}
+
+# thread counts for thread-pool curves; listing and header reads are I/O bound, so past the core count
+thread_counts = [1, 4, 16, 64]
+
+
+def worker_counts(max_workers=None):
+    """1, 2, 4... up to the core count, and the core count itself."""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def generated_folder(data_dir, case, seed, scale):
+    """Generate a case's input data, or reuse it if an earlier run already made the same data.
+
+    The folder name is built from the generator and its parameters, so cases
+    that share data (e.g. the cleaner and the concatenator) generate it once,
+    and keeping --data between runs means only the first run pays for it.
+    """
+    generate = case["generate"]
+    if generate is None:
+        return None, {}
+    data = {key: max(1, int(value * scale)) if key in case["scaled"] else value for key, value in case["data"].items()}
+    name = "_".join([generate.__name__, f"seed{seed}"] + [f"{key}{value}" for key, value in data.items()])
+    folder = os.path.join(data_dir, name)
+    # kept next to the folder rather than in it, so the runs never see it as input
+    manifest_path = folder + ".json"
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return folder, json.load(f)
+    if os.path.exists(folder):
+        shutil.rmtree(folder)  # left over from an interrupted run
+    os.makedirs(folder)
+    manifest = generate(folder, seed, **data)
+    manifest["data"] = data
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return folder, manifest
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB.
+
+    Read from VmHWM on Linux, because ru_maxrss carries over across exec: in a
+    freshly spawned process it would include the parent's memory at the time.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rusage_peak_mb(resource.RUSAGE_SELF) if resource else None
+
+
+def rusage_peak_mb(who):
+    """ru_maxrss in MB: it is in KB on Linux and bytes on macOS."""
+    return resource.getrusage(who).ru_maxrss / (1024 * 1024 if platform.system() == "Darwin" else 1024)
+
+
+def run_in_child(connection, name, folder, manifest, out_dir, options):
+    """Body of the benchmark process: import the case's modules, run it once and send back the result.
+
+    The scripts' own progress output is sent to devnull (including from their
+    worker processes) so it doesn't mix into the suite's report.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    case = cases[name]
+    try:
+        for module in case["modules"]:
+            importlib.import_module(module)
+    except ImportError as e:
+        connection.send({"skipped": str(e)})
+        return
+    try:
+        start = time.perf_counter()
+        result = case["run"](folder, manifest, out_dir, **options)
+        result.setdefault("seconds", time.perf_counter() - start)
+    except Exception as e:
+        connection.send({"error": f"{type(e).__name__}: {e}"})
+        return
+    result["peak_rss_mb"] = peak_rss_mb()
+    # the largest single worker process, once the case's pools have been shut down
+    result["workers_peak_rss_mb"] = (rusage_peak_mb(resource.RUSAGE_CHILDREN) or None) if resource else None
+    connection.send(result)
+
+
+def measure(name, folder, manifest, options):
+    """Run a case once in a freshly spawned process, so its peak RSS and imports are its own."""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    with tempfile.TemporaryDirectory() as out_dir:
+        process = context.Process(target=run_in_child, args=(sender, name, folder, manifest, out_dir, options))
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = None
+        process.join()
+    return result or {"error": f"benchmark process exited with code {process.exitcode}"}
+
+
+def run_case(name, folder, manifest, options, repeat=1):
+    """Time a case repeat times and summarise: median seconds, throughput and the highest peak RSS."""
+    record = {"case": name, "data": manifest.get("data", {}), "options": options}
+    runs = []
+    for _ in range(repeat):
+        result = measure(name, folder, manifest, options)
+        if "skipped" in result or "error" in result:
+            record.update(result)
+            return record
+        runs.append(result)
+    seconds = statistics.median(run["seconds"] for run in runs)
+    last = runs[-1]
+    record.update({
+        "unit": last["unit"],
+        "items": last["items"],
+        "failed": last["failed"],
+        "seconds": [round(run["seconds"], 4) for run in runs],
+        "median_seconds": round(seconds, 4),
+        "items_per_second": round(last["items"] / seconds, 2) if seconds else None,
+        "mb_per_second": round(last["bytes"] / seconds / 1e6, 2) if seconds and last["bytes"] else None,
+        "peak_rss_mb": max_or_none(run["peak_rss_mb"] for run in runs),
+        "workers_peak_rss_mb": max_or_none(run["workers_peak_rss_mb"] for run in runs),
+    })
+    return record
+
+
+def max_or_none(values):
+    values = [value for value in values if value is not None]
+    return round(max(values), 1) if values else None
+
+
+def git_describe():
+    """The commit being benchmarked, marked -dirty if the tree has changes."""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_record(record):
+    label = record["case"] + "".join(f" {key}={value}" for key, value in record["options"].items()
+                                     if key != "named_patterns")
+    if "skipped" in record or "error" in record:
+        print(f"{label:<50} {'skipped' if 'skipped' in record else 'failed'}: {record.get('skipped', record.get('error'))}")
+        return
+    mb = f"{record['mb_per_second']:8.1f} MB/s" if record["mb_per_second"] else " " * 13
+    rss = f"{record['peak_rss_mb']:7.0f} MB" if record["peak_rss_mb"] is not None else ""
+    failed = f"  ({record['failed']} failed)" if record["failed"] else ""
+    print(f"{label:<50} {record['median_seconds']:8.3f}s {record['items_per_second']:>14,.1f} "
+          f"{record['unit']}/s {mb} {rss}{failed}", flush=True)
+
+
+def run_suite(names, data_dir, scale=1.0, repeat=1, curves=False, seed=0, max_workers=None):
+    """Run the named cases (and their scaling curves) and return the results as a JSON-ready dict."""
+    results = []
+    report = {
+        "commit": git_describe(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+        "curves": {},
+    }
+    for name in names:
+        case = cases[name]
+        try:
+            folder, manifest = generated_folder(data_dir, case, seed, scale)
+        except ImportError as e:
+            record = {"case": name, "data": case["data"], "options": case["options"], "skipped": str(e)}
+            results.append(record)
+            print_record(record)
+            continue
+        option_sets = [case["options"]]
+        if curves and case["curve"]:
+            points = thread_counts if case["curve"] == "threads" else worker_counts(max_workers)
+            option_sets = [dict(case["options"], **{case["curve"]: point}) for point in points]
+        records = []
+        for options in option_sets:
+            record = run_case(name, folder, manifest, options, repeat)
+            results.append(record)
+            records.append(record)
+            print_record(record)
+            if "skipped" in record:
+                break
+        if len(option_sets) > 1:
+            report["curves"][name] = scaling_curve(case["curve"], records)
+    return report
+
+
+def scaling_curve(parameter, records):
+    """Throughput against worker/thread count, with the speedup over the first point."""
+    timed = [record for record in records if "items_per_second" in record]
+    base = timed[0]["items_per_second"] if timed else None
+    return {
+        "parameter": parameter,
+        "points": [{
+            parameter: record["options"][parameter],
+            "items_per_second": record["items_per_second"],
+            "speedup": round(record["items_per_second"] / base, 2) if base else None,
+            "peak_rss_mb": record["peak_rss_mb"],
+            "workers_peak_rss_mb": record["workers_peak_rss_mb"],
+        } for record in timed],
+    }
+
+
+def compare_reports(baseline, current):
+    """Print throughput and peak RSS of current relative to baseline, for the cases both ran."""
+    def key(record):
+        return record["case"], json.dumps(record["data"], sort_keys=True), json.dumps(record["options"], sort_keys=True)
+
+    before = {key(record): record for record in baseline["results"] if "items_per_second" in record}
+    print(f"{baseline.get('commit')} -> {current.get('commit')}: throughput and peak RSS (>1 is higher)")
+    for record in current["results"]:
+        old = before.get(key(record))
+        if old is None or "items_per_second" not in record:
+            continue
+        label = record["case"] + "".join(f" {k}={v}" for k, v in record["options"].items() if k != "named_patterns")
+        speed = record["items_per_second"] / old["items_per_second"] if old["items_per_second"] else float("nan")
+        memory = (f"{record['peak_rss_mb'] / old['peak_rss_mb']:6.2f}x"
+                  if record["peak_rss_mb"] and old["peak_rss_mb"] else "")
+        print(f"{label:<50} {speed:6.2f}x {memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every script's hot path on reproducible synthetic data "
+                                                 "and write the results as JSON.")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default: all): {', '.join(cases)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the data sizes, e.g. 0.1 for a quick run")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the median time is reported")
+    parser.add_argument("--curves", action="store_true", help="also run each case at increasing worker/thread counts")
+    parser.add_argument("--max-workers", type=int, help="top of the worker process curves (default: the core count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", help="keep the generated data here and reuse it next time (default: a temp folder)")
+    parser.add_argument("-o", "--output", help="results JSON (default: benchmark_<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="compare with a baseline results file, or give two files to just compare them")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes a baseline, or a baseline and a current results file")
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare_reports(json.load(f), json.load(g))
+        return
+    unknown = [name for name in args.cases if name not in cases]
+    if unknown:
+        parser.error(f"unknown case(s) {', '.join(unknown)}; choose from {', '.join(cases)}")
+
+    names = args.cases or list(cases)
+    if args.data:
+        os.makedirs(args.data, exist_ok=True)
+        report = run_suite(names, args.data, args.scale, args.repeat, args.curves, args.seed,
+                           args.max_workers)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            report = run_suite(names, data_dir, args.scale, args.repeat, args.curves, args.seed,
+                               args.max_workers)
+
+    output = args.output or f"benchmark_{report['commit'] or 'results'}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        with open(args.compare[0]) as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
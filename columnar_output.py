@@ -0,0 +1,148 @@
+import os
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+# output formats by file extension
+formats = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+extensions = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# bytes of CSV the types are inferred from, and read per record batch (one row group each)
+sample_size = 1024 * 1024
+block_size = 16 * 1024 * 1024
+
+
+def format_for_path(path):
+    """The columnar format implied by a file name, or None for anything else (e.g. .csv)."""
+    return formats.get(os.path.splitext(path)[1].lower())
+
+
+def parse_dtypes(overrides):
+    """Turn ["column=type", ...] from the command line into {column: pyarrow type}.
+
+    Types are pyarrow aliases, e.g. string, int64, double, bool, date32, timestamp[s].
+    """
+    dtypes = {}
+    for override in overrides or []:
+        column, _, alias = override.rpartition("=")
+        if not column:
+            raise ValueError(f"dtype overrides look like column=type, got {override!r}")
+        dtypes[column] = pa.type_for_alias(alias)
+    return dtypes
+
+
+def infer_schema(path, encoding="utf-8", dtypes=None):
+    """Column types for a CSV, inferred from its first sample_size bytes, with overrides applied."""
+    with pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(encoding=encoding, block_size=sample_size)) as reader:
+        schema = reader.schema
+    return apply_dtypes(schema, dtypes)
+
+
+def apply_dtypes(schema, dtypes=None):
+    """Replace field types with any explicit overrides; columns that were empty in the sample become strings."""
+    dtypes = dtypes or {}
+    fields = []
+    for field in schema:
+        field_type = dtypes.get(field.name, field.type)
+        fields.append(pa.field(field.name, pa.string() if pa.types.is_null(field_type) else field_type))
+    return pa.schema(fields)
+
+
+def unify_types(types):
+    """One type that every type in types can be converted to without losing values."""
+    types = [t for t in types if not pa.types.is_null(t)]
+    if not types:
+        return pa.null()
+    if all(t == types[0] for t in types):
+        return types[0]
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+def unify_schemas(schemas):
+    """Every column from every schema, in the order first seen, with types widened to fit them all."""
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, []).append(field.type)
+    return pa.schema([pa.field(name, unify_types(field_types)) for name, field_types in types.items()])
+
+
+def conform(batch, schema):
+    """Reorder, cast and pad (with nulls) a record batch so it matches schema."""
+    arrays = []
+    for field in schema:
+        positions = batch.schema.get_all_field_indices(field.name)
+        if not positions:
+            arrays.append(pa.nulls(batch.num_rows, field.type))
+            continue
+        array = batch.column(positions[0])
+        arrays.append(array if array.type == field.type else array.cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ColumnarWriter:
+    """Streams record batches into a Parquet or Arrow IPC file, one row group / batch at a time.
+
+    Batches are conformed to the writer's schema on the way in, so inputs with
+    missing, reordered or narrower columns can all go to the same file.
+    """
+
+    def __init__(self, path, schema, output_format=None, compression="snappy"):
+        self.schema = schema
+        self.rows = 0
+        output_format = output_format or format_for_path(path)
+        if output_format == "parquet":
+            self.writer = pq.ParquetWriter(path, schema, compression=compression)
+        elif output_format == "arrow":
+            self.writer = pa_ipc.new_file(path, schema)
+        else:
+            raise ValueError(f"unknown columnar format {output_format!r}, expected parquet or arrow")
+
+    def write_batch(self, batch):
+        batch = conform(batch, self.schema)
+        self.writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def write_frame(self, dataframe):
+        self.write_batch(pa.RecordBatch.from_pandas(dataframe, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def csv_to_columnar(filenames, output_path, output_format=None, dtypes=None, encoding="utf-8"):
+    """Stream one or more CSVs into a single Parquet/Arrow file without loading any of them whole.
+
+    Each file's types are inferred from a sample, the schemas are unified
+    across files (ints widen to floats, anything else mixed becomes text)
+    and dtypes overrides win over both. Every file is then read in
+    block_size record batches, converted straight to the unified types,
+    and written as its own row group. Returns the number of rows written.
+    """
+    schemas = [infer_schema(filename, encoding) for filename in filenames]
+    schema = apply_dtypes(unify_schemas(schemas), dtypes)
+    read_options = pa_csv.ReadOptions(encoding=encoding, block_size=block_size)
+    with ColumnarWriter(output_path, schema, output_format) as writer:
+        for filename, file_schema in zip(filenames, schemas):
+            column_types = {name: schema.field(name).type for name in file_schema.names}
+            convert_options = pa_csv.ConvertOptions(column_types=column_types)
+            try:
+                with pa_csv.open_csv(filename, read_options=read_options, convert_options=convert_options) as reader:
+                    for batch in reader:
+                        writer.write_batch(batch)
+            except pa.ArrowInvalid as e:
+                raise ValueError(f"{filename}: {e} - a column's type was guessed from the first "
+                                 f"{sample_size // 1024}KB, override it with a dtype (e.g. column=string)") from e
+    return writer.rows
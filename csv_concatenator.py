@@ -1,35 +1,232 @@
 import csv
+import io
 import os
+import re
+import glob
+import time
+import shutil
+import argparse
+import tempfile
 
-folder_path = input("enter the folder where the CSV files are stored")
-output_filename = "{folder_path}_merged.csv"
-
-# Get a list of the filenames in the order you specified
-filenames = [f'{folder_path}/{i}.csv' for i in range(1, 7)]
-
-# Check for file existence and notify if not found
-for idx, filename in enumerate(filenames):
-    if not os.path.exists(filename):
-        print(f"File not found: {filename}")
-        continue
-
-# Create or overwrite the output file
-with open(output_filename, 'w', newline='') as outfile:
-    writer = csv.writer(outfile)
-    
-    for idx, filename in enumerate(filenames):
-        with open(filename, 'r', newline='') as infile:
-            reader = csv.reader(infile)
-            
-            # If it's the first file, write headers and all rows
-            if idx == 0:
-                for row in reader:
-                    writer.writerow(row)
-            else:
-                # For subsequent files, skip the header row
-                next(reader)
-                for row in reader:
-                    writer.writerow(row)
-
-print(f'All CSV files have been concatenated into {output_filename}')
+try:
+    from columnar_output import csv_to_columnar, format_for_path, parse_dtypes
+except ImportError:  # only needed for Parquet/Arrow output
+    csv_to_columnar = format_for_path = parse_dtypes = None
 
+# bytes copied per read when a file's body goes straight through untouched
+block_size = 16 * 1024 * 1024
+# decoding with surrogateescape means the parse path passes any encoding through byte-for-byte
+encoding = 'utf-8'
+errors = 'surrogateescape'
+
+def natural_key(path):
+    # so 2.csv sorts before 10.csv
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path)]
+
+def expand_inputs(inputs, output_filename=None):
+    # turns a mix of files, folders (every .csv inside) and glob patterns into a list of
+    # files, in the order given and naturally sorted within each folder/pattern.
+    # The output file is left out in case it sits in the same folder
+    filenames = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(glob.glob(os.path.join(item, '*.csv')), key=natural_key)
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item), key=natural_key)
+        else:
+            matches = [item]
+        for filename in matches:
+            if not os.path.exists(filename):
+                print(f"File not found: {filename}")
+            elif output_filename and os.path.abspath(filename) == os.path.abspath(output_filename):
+                continue
+            elif filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+def read_header(infile):
+    # reads the header record from a file opened in binary mode, leaving the file positioned
+    # at the start of the body. Returns (raw header bytes, column names). Keeps reading lines
+    # while a quote is open, in case a column name has a line break in it
+    raw = infile.readline()
+    while raw.count(b'"') % 2:
+        line = infile.readline()
+        if not line:
+            break
+        raw += line
+    header = raw[3:] if raw.startswith(b'\xef\xbb\xbf') else raw
+    columns = next(csv.reader(io.StringIO(header.decode(encoding, errors))), [])
+    return raw, columns
+
+def column_keys(header):
+    # (name, occurrence) for each column, so repeated or blank names stay separate columns:
+    # a,,b, -> (a, 0), ('', 0), (b, 0), ('', 1)
+    seen = {}
+    keys = []
+    for column in header:
+        keys.append((column, seen.get(column, 0)))
+        seen[column] = seen.get(column, 0) + 1
+    return keys
+
+def union_columns(headers):
+    # every column from every file, in the order they are first seen, as (name, occurrence)
+    # keys. A name repeated in a file is kept as many times as the most any file has it
+    keys = []
+    for header in headers:
+        keys.extend(key for key in column_keys(header) if key not in keys)
+    return keys
+
+def line_ending(raw_header):
+    return '\r\n' if raw_header.endswith(b'\r\n') else '\n'
+
+def concatenate_csvs(filenames, output_filename):
+    # Writes the header once followed by the body of every file. Files whose columns match
+    # the output header exactly are copied as raw bytes in large blocks without being parsed.
+    # Only files with different columns are parsed, and their rows are written out under
+    # the union of all the files' columns (missing columns left blank).
+    # Returns (files copied raw, files reconciled, bytes written)
+    headers = []
+    for filename in filenames:
+        with open(filename, 'rb') as infile:
+            headers.append(read_header(infile))
+    keys = union_columns(columns for _, columns in headers)
+    columns = [name for name, _ in keys]
+    newline = line_ending(headers[0][0])
+    copied = reconciled = 0
+
+    with open(output_filename, 'wb') as outfile:
+        if headers[0][1] == columns:
+            outfile.write(headers[0][0] if headers[0][0].endswith(b'\n') else headers[0][0] + newline.encode())
+        else:
+            header_text = io.StringIO()
+            csv.writer(header_text, lineterminator=newline).writerow(columns)
+            outfile.write(header_text.getvalue().encode(encoding, errors))
+        for filename, (raw_header, file_columns) in zip(filenames, headers):
+            with open(filename, 'rb') as infile:
+                infile.seek(len(raw_header))
+                if file_columns == columns:
+                    shutil.copyfileobj(infile, outfile, block_size)
+                    # a file without a trailing newline would run into the next file's first row
+                    if infile.tell() > len(raw_header):
+                        infile.seek(-1, os.SEEK_END)
+                        if infile.read(1) != b'\n':
+                            outfile.write(newline.encode())
+                    copied += 1
+                else:
+                    # where each output column comes from in this file's rows (None = not in this file)
+                    file_positions = {key: position for position, key in enumerate(column_keys(file_columns))}
+                    positions = [file_positions.get(key) for key in keys]
+                    text_out = io.TextIOWrapper(outfile, encoding=encoding, errors=errors, newline='')
+                    writer = csv.writer(text_out, lineterminator=newline)
+                    reader = csv.reader(io.TextIOWrapper(infile, encoding=encoding, errors=errors, newline=''))
+                    writer.writerows([row[p] if p is not None and p < len(row) else '' for p in positions]
+                                     for row in reader)
+                    text_out.detach()
+                    reconciled += 1
+        written = outfile.tell()
+    return copied, reconciled, written
+
+def write_sample_csvs(folder, n_files=6, n_rows=200_000):
+    # synthetic inputs for the benchmark, all with the same header
+    filenames = []
+    for i in range(1, n_files + 1):
+        filename = os.path.join(folder, f'{i}.csv')
+        with open(filename, 'w', newline='') as f:
+            f.write('site_id,ngr,easting,northing,description\n')
+            f.writelines(f'{i}-{n},TQ{n % 100000:05d}{n % 99991:05d},{n % 700000},{n % 1300000},"trench {n}, fill"\n'
+                         for n in range(n_rows))
+        filenames.append(filename)
+    return filenames
+
+def benchmark_concatenation(n_files=6, n_rows=200_000):
+    # compares the raw block copy with the old csv.reader/csv.writer round trip,
+    # and with a plain copy of the same bytes as the ceiling
+    with tempfile.TemporaryDirectory() as folder:
+        filenames = write_sample_csvs(folder, n_files, n_rows)
+        total = sum(os.path.getsize(f) for f in filenames)
+        output_filename = os.path.join(folder, 'merged.csv')
+
+        def parse_and_rewrite():
+            with open(output_filename, 'w', newline='') as outfile:
+                writer = csv.writer(outfile)
+                for idx, filename in enumerate(filenames):
+                    with open(filename, 'r', newline='') as infile:
+                        reader = csv.reader(infile)
+                        if idx:
+                            next(reader)
+                        writer.writerows(reader)
+
+        def plain_copy():
+            with open(output_filename, 'wb') as outfile:
+                for filename in filenames:
+                    with open(filename, 'rb') as infile:
+                        shutil.copyfileobj(infile, outfile, block_size)
+
+        print(f"{n_files} files, {total / 1e6:.0f} MB")
+        for name, run in (('csv reader/writer', parse_and_rewrite),
+                          ('raw block copy', lambda: concatenate_csvs(filenames, output_filename)),
+                          ('plain file copy', plain_copy)):
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+            print(f"{name:<18} {seconds:6.2f}s  {total / seconds / 1e6:7.1f} MB/s")
+
+        if csv_to_columnar is not None:
+            # what the next step in the chain pays to load the merged output back in
+            import pandas as pd
+            concatenate_csvs(filenames, output_filename)
+            parquet_filename = os.path.join(folder, 'merged.parquet')
+            start = time.perf_counter()
+            csv_to_columnar(filenames, parquet_filename)
+            print(f"{'write parquet':<18} {time.perf_counter() - start:6.2f}s")
+            for name, load in (('load csv', lambda: pd.read_csv(output_filename)),
+                               ('load parquet', lambda: pd.read_parquet(parquet_filename))):
+                start = time.perf_counter()
+                load()
+                print(f"{name:<18} {time.perf_counter() - start:6.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concatenate CSV files, writing the header only once.")
+    parser.add_argument('inputs', nargs='*', help="CSV files, folders or glob patterns, in order (asks for a folder if not given)")
+    parser.add_argument('-o', '--output', help="output file (default: <folder>_merged.csv next to the first input folder)")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'],
+                        help="output format (default: from the output file extension, otherwise csv)")
+    parser.add_argument('--dtype', action='append', metavar='COLUMN=TYPE',
+                        help="Parquet/Arrow column type instead of the inferred one, e.g. --dtype site_id=string")
+    parser.add_argument('--encoding', default='utf-8', help="input encoding for Parquet/Arrow output (default utf-8)")
+    parser.add_argument('--benchmark', action='store_true', help="time concatenation of synthetic CSVs")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_concatenation()
+        return
+
+    inputs = args.inputs or [input("enter the folder where the CSV files are stored")]
+    output_format = args.format or (format_for_path(args.output) if args.output and format_for_path else None) or 'csv'
+    if output_format != 'csv' and csv_to_columnar is None:
+        raise ImportError("Parquet/Arrow output needs pyarrow and columnar_output.py alongside this script")
+    output_filename = args.output
+    if not output_filename:
+        base = inputs[0] if os.path.isdir(inputs[0]) else os.path.dirname(os.path.abspath(inputs[0]))
+        output_filename = f"{os.path.normpath(base)}_merged.{output_format}"
+
+    filenames = expand_inputs(inputs, output_filename)
+    if not filenames:
+        print("No CSV files found")
+        return
+
+    start = time.perf_counter()
+    if output_format != 'csv':
+        rows = csv_to_columnar(filenames, output_filename, output_format, parse_dtypes(args.dtype), args.encoding)
+        seconds = time.perf_counter() - start
+        print(f"{len(filenames)} files, {rows} rows written as {output_format} in {seconds:.1f}s")
+        print(f'All CSV files have been concatenated into {output_filename}')
+        return
+    copied, reconciled, written = concatenate_csvs(filenames, output_filename)
+    seconds = time.perf_counter() - start
+    print(f"{copied} files copied as-is, {reconciled} reconciled to the combined columns, "
+          f"{written / 1e6:.1f} MB in {seconds:.1f}s ({written / seconds / 1e6 if seconds else 0:.0f} MB/s)")
+    print(f'All CSV files have been concatenated into {output_filename}')
+
+if __name__ == '__main__':
+    main()
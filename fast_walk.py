@@ -0,0 +1,178 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# One directory listing: files and dirs are os.DirEntry objects, depth is 0 for the top folder
+FolderListing = namedtuple("FolderListing", "path depth dirs files")
+
+# threads listing directories at once; listing is I/O bound, so on network shares far
+# more threads than cores pay off
+default_threads = 16
+
+
+def has_extension(name, extensions):
+    """Case-insensitive extension check; extensions=None matches everything."""
+    return extensions is None or os.path.splitext(name)[1].lower() in extensions
+
+
+def list_folder(path, depth, stat=False, stat_extensions=None, follow_symlinks=False):
+    """List one folder with os.scandir, splitting the entries into dirs and files.
+
+    With stat, files matching stat_extensions (None = all) are stat'd here, in
+    the worker thread, so entry.stat() is already cached when the caller asks
+    for it; files that can't be stat'd are left out. Raises OSError if the
+    folder can't be listed.
+    """
+    dirs, files = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+            except OSError:
+                continue
+            (dirs if is_dir else files).append(entry)
+    if stat:
+        files = [entry for entry in files if not has_extension(entry.name, stat_extensions) or stat_entry(entry)]
+    return FolderListing(path, depth, dirs, files)
+
+
+def stat_entry(entry):
+    """Stat an entry so the result is cached on it; False if it can't be (e.g. a broken symlink)."""
+    try:
+        entry.stat()
+    except OSError:
+        return False
+    return True
+
+
+def walk_folders(top, skip=None, max_depth=None, threads=default_threads, stat=False, stat_extensions=None,
+                 follow_symlinks=False, onerror=None):
+    """Walk one or more folder trees, listing many directories at once on a thread pool.
+
+    Yields a FolderListing per folder as soon as it has been listed, so the
+    order is not os.walk's. skip(name) -> True leaves a folder out along with
+    everything below it (the top folders are checked too). max_depth limits how
+    far down to go: 0 lists only the top folders, None means no limit.
+    With stat, files (only those matching stat_extensions if given) are stat'd
+    in the pool, so their DirEntry.stat() is then free. Stopping the
+    generator early cancels listings that haven't started.
+    Folders that can't be listed are skipped, as os.walk does; onerror, if
+    given, is called with the OSError (its filename is the folder's path) so
+    callers can tell an unreadable folder from an empty one.
+    """
+    tops = [top] if isinstance(top, (str, os.PathLike)) else list(top)
+    stat_extensions = None if stat_extensions is None else {e.lower() for e in stat_extensions}
+    executor = ThreadPoolExecutor(max_workers=threads)
+    try:
+        pending = {executor.submit(list_folder, path, 0, stat, stat_extensions, follow_symlinks)
+                   for path in tops if not (skip and skip(os.path.basename(os.path.normpath(path))))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    listing = future.result()
+                except OSError as e:
+                    if onerror:
+                        onerror(e)
+                    continue
+                if max_depth is None or listing.depth < max_depth:
+                    for entry in listing.dirs:
+                        if not (skip and skip(entry.name)):
+                            pending.add(executor.submit(list_folder, entry.path, listing.depth + 1,
+                                                        stat, stat_extensions, follow_symlinks))
+                yield listing
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def walk(top, extensions=None, skip=None, max_depth=None, threads=default_threads, stat=False, follow_symlinks=False,
+         onerror=None):
+    """Yield os.DirEntry objects for the files under top (see walk_folders).
+
+    extensions filters by file extension, case-insensitively (e.g. [".csv"]).
+    With stat=True each yielded entry has already been stat'd in the pool.
+    """
+    extensions = None if extensions is None else {e.lower() for e in extensions}
+    for listing in walk_folders(top, skip, max_depth, threads, stat, extensions, follow_symlinks, onerror):
+        for entry in listing.files:
+            if has_extension(entry.name, extensions):
+                yield entry
+
+
+def make_tree(root, depth=4, fanout=4, files_per_folder=8):
+    """Build a synthetic tree of empty files, fanout sub-folders per level."""
+    folders = [root]
+    for level in range(depth):
+        next_folders = []
+        for folder in folders:
+            for i in range(fanout):
+                path = os.path.join(folder, f"level{level}_{i}")
+                os.makedirs(path)
+                next_folders.append(path)
+        folders = next_folders
+    for folder in folders:
+        for i in range(files_per_folder):
+            open(os.path.join(folder, f"file_{i}.tif"), "w").close()
+    return len(folders) * files_per_folder
+
+
+def benchmark_walkers(latency=0.005, depth=4, fanout=4, files_per_folder=8, thread_counts=(1, 4, 16, 64)):
+    """Compare os.walk with walk() on a synthetic tree, adding latency to every directory listing.
+
+    The latency stands in for a network share or cloud mount, where each
+    listing is a round trip; it is injected by wrapping os.scandir (which
+    os.walk uses too) for the duration of the benchmark.
+    """
+    real_scandir = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(latency)
+        return real_scandir(path)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        n_files = make_tree(root, depth, fanout, files_per_folder)
+        os.scandir = slow_scandir
+        try:
+            start = time.perf_counter()
+            found = sum(len(files) for _, _, files in os.walk(root))
+            results["os.walk"] = time.perf_counter() - start
+            assert found == n_files
+            for threads in thread_counts:
+                start = time.perf_counter()
+                found = sum(1 for _ in walk(root, threads=threads))
+                results[f"walk, {threads} threads"] = time.perf_counter() - start
+                assert found == n_files
+        finally:
+            os.scandir = real_scandir
+
+    print(f"{n_files} files in {sum(fanout ** level for level in range(depth + 1))} folders, "
+          f"{latency * 1000:.0f}ms per listing")
+    for name, seconds in results.items():
+        print(f"{name:<20} {seconds:7.2f}s  {results['os.walk'] / seconds:5.1f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List files under a folder with a concurrent scandir walker.")
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--extensions", nargs="+", help="only files with these extensions, e.g. .tif .png")
+    parser.add_argument("--max-depth", type=int)
+    parser.add_argument("--threads", type=int, default=default_threads)
+    parser.add_argument("--benchmark", action="store_true", help="os.walk vs this walker on a synthetic tree with latency")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to each listing in the benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_walkers(args.latency)
+        return
+    if args.folder:
+        for entry in walk(args.folder, args.extensions, max_depth=args.max_depth, threads=args.threads):
+            print(entry.path)
+
+
+if __name__ == "__main__":
+    main()
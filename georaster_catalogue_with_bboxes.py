@@ -1,128 +1,899 @@
 import os
 import csv
+import sys
+import time
+import argparse
+import multiprocessing
 import uuid
-from queue import Queue
-from threading import Thread
-from osgeo import gdal
+import heapq
+import json
+import struct
+import hashlib
+import sqlite3
+import tempfile
+import xml.etree.ElementTree as ET
+from queue import Queue, Full
+from threading import Lock, Thread
+from osgeo import gdal, ogr, osr
 import geopandas as gpd
-from shapely.geometry import Polygon
+from shapely.geometry import Polygon, box
 from pyproj import CRS
-import tkinter as tk
-from tkinter import filedialog, ttk
-from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from fast_walk import walk_folders
 
 # Enable GDAL exceptions to handle errors properly
 gdal.UseExceptions()
+ogr.UseExceptions()
 
 def log_message(log_queue, message):
     """Add a message to the log queue."""
     log_queue.put(message)
 
-def log_updater(log_box, log_queue):
+class ConsoleLog:
+    """Stand-in for the UI log queue that prints messages straight away, for headless runs."""
+
+    def put(self, message):
+        print(message, flush=True)
+
+def log_updater(root, log_box, log_queue):
     """Update log messages from the queue."""
+    import tkinter as tk
+
     while not log_queue.empty():
         message = log_queue.get()
         log_box.config(state=tk.NORMAL)
         log_box.insert(tk.END, message + "\n")
         log_box.config(state=tk.DISABLED)
         log_box.see(tk.END)
-    root.after(100, log_updater, log_box, log_queue)
+    root.after(100, log_updater, root, log_box, log_queue)
 
-def should_skip_folder(folder_name):
+default_skip_keywords = ["admin", "archiving"] # alter this list with your own keywords to ignore
+default_extensions = [".tif", ".png"]
+
+def should_skip_folder(folder_name, skip_keywords=None):
     """Check if a folder should be skipped based on its name."""
-    skip_keywords = ["admin", "archiving"] # alter this list with your own keywords to ignore
+    skip_keywords = default_skip_keywords if skip_keywords is None else [k.lower() for k in skip_keywords]
     if folder_name.lower() in skip_keywords or folder_name.lower().startswith("00000"):
         return True
     return False
 
-def process_rasters_parallel(input_folder, output_gpkg_base, output_crs, default_crs, search_subfolders, log_queue):
-    """Catalog and process raster files in parallel."""
-    raster_files = []
-    extensions = [".tif", ".png"]
+# TIFF field types we need to read: SHORT, LONG, DOUBLE, LONG8 (BigTIFF)
+tiff_field_types = {3: ("H", 2), 4: ("I", 4), 12: ("d", 8), 16: ("Q", 8)}
 
-    def discover_files():
-        """Discover files recursively or in a single folder."""
-        for root_dir, dirs, files in os.walk(input_folder):
-            # Skip specified folders
-            dirs[:] = [d for d in dirs if not should_skip_folder(d)]
-            if should_skip_folder(os.path.basename(root_dir)):
-                log_message(log_queue, f"Skipping folder and subfolders: {root_dir}")
-                continue
+# TIFF tags that hold the raster size and GeoTIFF georeferencing
+tiff_geo_tags = {
+    256: "width",
+    257: "height",
+    33550: "pixel_scale",
+    33922: "tiepoints",
+    34264: "transformation",
+    34735: "geokeys",
+}
 
-            # Filter raster files
-            relevant_files = [os.path.join(root_dir, f) for f in files if os.path.splitext(f)[1].lower() in extensions]
-            if relevant_files:
-                raster_files.extend(relevant_files)
-                log_message(log_queue, f"Discovered folder with files: {root_dir}")
+def read_tiff_tags(file):
+    """Read the size and GeoTIFF tags from the first IFD of a TIFF or BigTIFF, without decoding pixels."""
+    with open(file, "rb") as f:
+        header = f.read(16)
+        if header[:2] == b"II":
+            order = "<"
+        elif header[:2] == b"MM":
+            order = ">"
+        else:
+            return None
+        magic = struct.unpack(order + "H", header[2:4])[0]
+        if magic == 42:
+            # Classic TIFF: 2-byte entry count, 4-byte counts and offsets
+            entry_count_format, field_format, field_size = "H", "I", 4
+            ifd_offset = struct.unpack(order + "I", header[4:8])[0]
+        elif magic == 43:
+            # BigTIFF: 8-byte entry count, counts and offsets
+            entry_count_format, field_format, field_size = "Q", "Q", 8
+            ifd_offset = struct.unpack(order + "Q", header[8:16])[0]
+        else:
+            return None
+
+        f.seek(ifd_offset)
+        entry_count_size = struct.calcsize(entry_count_format)
+        entry_count = struct.unpack(order + entry_count_format, f.read(entry_count_size))[0]
+        entry_size = 4 + 2 * field_size
+        entries = f.read(entry_count * entry_size)
+
+        tags = {}
+        for i in range(entry_count):
+            entry = entries[i * entry_size:(i + 1) * entry_size]
+            tag, field_type = struct.unpack(order + "HH", entry[:4])
+            if tag not in tiff_geo_tags or field_type not in tiff_field_types:
+                continue
+            value_count = struct.unpack(order + field_format, entry[4:4 + field_size])[0]
+            value_format, value_size = tiff_field_types[field_type]
+            data_size = value_count * value_size
+            value_field = entry[4 + field_size:]
+            if data_size <= field_size:
+                data = value_field[:data_size]
             else:
-                log_message(log_queue, f"No relevant files found in folder: {root_dir}")
+                f.seek(struct.unpack(order + field_format, value_field)[0])
+                data = f.read(data_size)
+            tags[tiff_geo_tags[tag]] = struct.unpack(order + value_format * value_count, data)
+    return tags
+
+def geotransform_from_tiff_tags(tags):
+    """Build a GDAL-style geotransform from GeoTIFF tags, or None if the TIFF isn't georeferenced."""
+    if "transformation" in tags:
+        m = tags["transformation"]
+        gt = [m[3], m[0], m[1], m[7], m[4], m[5]]
+    elif "tiepoints" in tags and "pixel_scale" in tags:
+        i, j, _, x, y, _ = tags["tiepoints"][:6]
+        scale_x, scale_y = tags["pixel_scale"][:2]
+        gt = [x - i * scale_x, scale_x, 0.0, y + j * scale_y, 0.0, -scale_y]
+    else:
+        return None
+
+    # GTRasterTypeGeoKey (1025) = 2 means PixelIsPoint; shift to pixel corners as GDAL does
+    geokeys = tags.get("geokeys", ())
+    for k in range(4, len(geokeys) - 3, 4):
+        if geokeys[k] == 1025 and geokeys[k + 1] == 0 and geokeys[k + 3] == 2:
+            gt[0] -= 0.5 * gt[1] + 0.5 * gt[2]
+            gt[3] -= 0.5 * gt[4] + 0.5 * gt[5]
+    return tuple(gt)
+
+def read_png_size(file):
+    """Read width and height from a PNG's IHDR chunk."""
+    with open(file, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+def read_world_file(world_file):
+    """Read a world file (A, D, B, E, C, F referencing pixel centres) as a GDAL geotransform."""
+    with open(world_file, "r") as f:
+        a, d, b, e, c, f_ = (float(line) for line in f.read().split()[:6])
+    return (c - 0.5 * a - 0.5 * b, a, b, f_ - 0.5 * d - 0.5 * e, d, e)
+
+def read_aux_xml_geotransform(aux_file):
+    """Read the GeoTransform from a GDAL .aux.xml sidecar, if it has one."""
+    element = ET.parse(aux_file).getroot().find("GeoTransform")
+    if element is None or not element.text:
+        return None
+    return tuple(float(value) for value in element.text.split(","))
+
+def find_sidecar(file, siblings, suffixes):
+    """Return the path of the first sidecar of file with one of the given suffixes.
+
+    siblings maps lower-case file names in the folder to their real names, so
+    sidecars are found without probing the file system.
+    """
+    folder, name = os.path.split(file)
+    stem = os.path.splitext(name)[0]
+    for suffix in suffixes:
+        for candidate in (name + suffix, stem + suffix):
+            real_name = siblings.get(candidate.lower())
+            if real_name:
+                return os.path.join(folder, real_name)
+    return None
+
+def world_file_suffixes(file):
+    """World file extensions GDAL looks for, e.g. .tfw/.tifw/.wld for a .tif."""
+    ext = os.path.splitext(file)[1].lower()
+    return [f".{ext[1]}{ext[-1]}w", f"{ext}w", ".wld"]
+
+def read_raster_header(file, siblings):
+    """Read (width, height, geotransform) from file headers and sidecars only.
+
+    Follows GDAL's georeferencing priority: .aux.xml, then GeoTIFF tags, then
+    a world file. Returns None if the file can't be read this way, so the
+    caller can fall back to GDAL.
+    """
+    ext = os.path.splitext(file)[1].lower()
+    if ext in (".tif", ".tiff"):
+        tags = read_tiff_tags(file)
+        if not tags or "width" not in tags or "height" not in tags:
+            return None
+        size = (tags["width"][0], tags["height"][0])
+        internal_gt = geotransform_from_tiff_tags(tags)
+    elif ext == ".png":
+        size = read_png_size(file)
+        if size is None:
+            return None
+        internal_gt = None
+    else:
+        return None
+
+    aux_file = find_sidecar(file, siblings, [".aux.xml"])
+    gt = read_aux_xml_geotransform(aux_file) if aux_file else None
+    if gt is None:
+        gt = internal_gt
+    if gt is None:
+        world_file = find_sidecar(file, siblings, world_file_suffixes(file))
+        gt = read_world_file(world_file) if world_file else (0.0, 1.0, 0.0, 0.0, 0.0, 1.0)
+    return size[0], size[1], gt
+
+def open_dataset(file, siblings):
+    """Open a raster with GDAL, handing it the folder listing so it doesn't rescan the folder for sidecars."""
+    return gdal.OpenEx(
+        file, gdal.OF_RASTER | gdal.OF_READONLY,
+        sibling_files=sorted(siblings.values()) if siblings is not None else None,
+    )
+
+def read_raster_record(file, siblings=None, timings=None):
+    """Read the catalogue record (bounding box, CRS) for a single raster file.
+
+    siblings maps lower-case names of the files in the same folder to their
+    real names. When given, the size and geotransform are read from file
+    headers and sidecars without opening a GDAL dataset, falling back to GDAL
+    for anything the header reader can't handle. If a timings dict is passed,
+    seconds spent in the open, geotransform and crs stages are added to it.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    header = None
+    if siblings is not None:
+        try:
+            header = read_raster_header(file, siblings)
+        except (OSError, ValueError, struct.error, ET.ParseError):
+            header = None
+    if header is None:
+        dataset = open_dataset(file, siblings)
+        if dataset is None:
+            raise ValueError(f"Unsupported file format for {file}")
+    opened = time.perf_counter()
+    timings["open"] = opened - start
+
+    if header is not None:
+        corners = corners_from_geotransform(*header)
+    else:
+        corners = get_corner_coords(dataset)
+    timings["geotransform"] = time.perf_counter() - opened
+
+    # Check for georeferenced rasters
+    if corners[0][0] == 0 or corners[2][1] == 0:
+        raise ValueError(f"Non-georeferenced raster: {file}")
+
+    crs_start = time.perf_counter()
+    if siblings is not None:
+        prj_file = find_sidecar(file, siblings, [".prj"])
+    else:
+        prj_file = os.path.splitext(file)[0] + ".prj"
+        prj_file = prj_file if os.path.isfile(prj_file) else None
+    crs = get_crs_from_prj(prj_file) if prj_file else "N/A"
+    timings["crs"] = time.perf_counter() - crs_start
 
-    def process_file(file):
-        """Process a single raster file."""
+    return {
+        "filepath": os.path.normpath(file),
+        "filename": os.path.basename(file),
+        "crs": crs,
+        "minx": corners[0][0],
+        "miny": corners[0][1],
+        "maxx": corners[2][0],
+        "maxy": corners[2][1],
+        "geometry": Polygon(corners),
+    }
+
+def open_catalogue_index(index_path):
+    """Open (creating if needed) the SQLite index of catalogued files, keyed by path with size and mtime."""
+    connection = sqlite3.connect(index_path)
+    connection.execute(
+        """CREATE TABLE IF NOT EXISTS catalogue_index (
+            filepath TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            filename TEXT,
+            crs TEXT,
+            minx REAL,
+            miny REAL,
+            maxx REAL,
+            maxy REAL,
+            error TEXT,
+            prj_mtime_ns INTEGER
+        )"""
+    )
+    # Indexes written before the .prj sidecar was tracked lack the column; their files are re-read once
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(catalogue_index)")]
+    if "prj_mtime_ns" not in columns:
+        with connection:
+            connection.execute("ALTER TABLE catalogue_index ADD COLUMN prj_mtime_ns INTEGER")
+    return connection
+
+def index_path_for(output_gpkg_base):
+    """Default location of the catalogue index, next to the output GeoPackage."""
+    return os.path.splitext(output_gpkg_base)[0] + "_index.sqlite"
+
+def catalogue_path_for(output_gpkg_base):
+    """The single GeoPackage a scan writes its catalogue to."""
+    return output_gpkg_base if output_gpkg_base.lower().endswith(".gpkg") else output_gpkg_base + ".gpkg"
+
+def get_file_stat(file, prj_file=None):
+    """Return the (size, mtime_ns, prj_mtime_ns) tuple used to spot new or modified files.
+
+    prj_file is the file's .prj sidecar, if it has one, as the CRS is read from
+    it; prj_mtime_ns is None without one. Either can be a path or an
+    os.DirEntry, whose stat is cached from the walk.
+    """
+    stat = file.stat() if isinstance(file, os.DirEntry) else os.stat(file)
+    prj_mtime_ns = None
+    if prj_file is not None:
+        prj_mtime_ns = (prj_file.stat() if isinstance(prj_file, os.DirEntry) else os.stat(prj_file)).st_mtime_ns
+    return stat.st_size, stat.st_mtime_ns, prj_mtime_ns
+
+def index_folder_prefix(input_folder):
+    """Prefix of the indexed paths under input_folder, so one index can hold several roots."""
+    return os.path.join(os.path.normpath(input_folder), "")
+
+def load_indexed_stats(connection, input_folder):
+    """Return {filepath: (size, mtime_ns, prj_mtime_ns)} for every indexed file under input_folder."""
+    folder_prefix = index_folder_prefix(input_folder)
+    return {
+        filepath: (size, mtime_ns, prj_mtime_ns)
+        for filepath, size, mtime_ns, prj_mtime_ns in connection.execute(
+            "SELECT filepath, size, mtime_ns, prj_mtime_ns FROM catalogue_index"
+        )
+        if filepath.startswith(folder_prefix)
+    }
+
+def update_catalogue_index(connection, entries, deleted):
+    """Upsert freshly processed entries and drop deleted files in one transaction."""
+    with connection:
+        connection.executemany("DELETE FROM catalogue_index WHERE filepath = ?", [(f,) for f in deleted])
+        connection.executemany(
+            """INSERT OR REPLACE INTO catalogue_index
+               (filepath, size, mtime_ns, filename, crs, minx, miny, maxx, maxy, error, prj_mtime_ns)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            entries,
+        )
+
+def export_catalogue_index(connection, writer, input_folder=None):
+    """Send every successfully catalogued file in the index (under input_folder, if given) to a GeoPackageWriter."""
+    folder_prefix = index_folder_prefix(input_folder) if input_folder else ""
+    rows = connection.execute(
+        """SELECT filepath, filename, crs, minx, miny, maxx, maxy FROM catalogue_index
+           WHERE error IS NULL ORDER BY filepath"""
+    )
+    count = 0
+    for filepath, filename, file_crs, minx, miny, maxx, maxy in rows:
+        if not filepath.startswith(folder_prefix):
+            continue
+        writer.write({
+            "filepath": filepath,
+            "filename": filename,
+            "crs": file_crs,
+            "minx": minx,
+            "miny": miny,
+            "maxx": maxx,
+            "maxy": maxy,
+            "geometry": box(minx, miny, maxx, maxy),
+        })
+        count += 1
+    return count
+
+class GeoPackageWriter:
+    """Write catalogue records to a single GeoPackage layer from a dedicated thread.
+
+    Records are handed over through a bounded queue and appended in
+    transactions of commit_size features. The spatial index is built once
+    when the writer is closed rather than updated on every insert.
+    """
+
+    string_fields = ["filepath", "filename", "crs"]
+    real_fields = ["minx", "miny", "maxx", "maxy"]
+
+    def __init__(self, output_gpkg, crs, commit_size=5000):
+        self.output_gpkg = output_gpkg
+        self.crs = crs
+        self.commit_size = commit_size
+        self.layer_name = os.path.splitext(os.path.basename(output_gpkg))[0]
+        self.count = 0
+        self.write_seconds = 0.0
+        self.error = None
+        self.records = Queue(maxsize=commit_size * 2)
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record):
+        """Queue a record for writing."""
+        while True:
+            if self.error:
+                raise self.error
+            try:
+                self.records.put(record, timeout=1)
+                return
+            except Full:
+                continue
+
+    def close(self):
+        """Flush outstanding records, build the spatial index and wait for the writer thread."""
+        if self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join()
+        if self.error:
+            raise self.error
+
+    def _create_layer(self, dataset):
+        srs = osr.SpatialReference()
+        srs.SetFromUserInput(self.crs)
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        layer = dataset.CreateLayer(
+            self.layer_name, srs, ogr.wkbPolygon,
+            options=["GEOMETRY_NAME=geometry", "SPATIAL_INDEX=NO"],
+        )
+        for name in self.string_fields:
+            layer.CreateField(ogr.FieldDefn(name, ogr.OFTString))
+        for name in self.real_fields:
+            layer.CreateField(ogr.FieldDefn(name, ogr.OFTReal))
+        return layer
+
+    def _run(self):
+        finished = False  # set once the end-of-records sentinel has been taken off the queue
         try:
-            dataset = gdal.Open(file)
-            if dataset is None:
-                raise ValueError(f"Unsupported file format for {file}")
+            driver = ogr.GetDriverByName("GPKG")
+            if os.path.exists(self.output_gpkg):
+                driver.DeleteDataSource(self.output_gpkg)
+            dataset = driver.CreateDataSource(self.output_gpkg)
+            layer = self._create_layer(dataset)
+            definition = layer.GetLayerDefn()
+
+            dataset.StartTransaction()
+            while True:
+                record = self.records.get()
+                if record is None:
+                    finished = True
+                    break
+                start = time.perf_counter()
+                feature = ogr.Feature(definition)
+                for name in self.string_fields + self.real_fields:
+                    feature.SetField(name, record[name])
+                feature.SetGeometry(ogr.CreateGeometryFromWkb(record["geometry"].wkb))
+                layer.CreateFeature(feature)
+                self.count += 1
+                if self.count % self.commit_size == 0:
+                    dataset.CommitTransaction()
+                    dataset.StartTransaction()
+                self.write_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            dataset.CommitTransaction()
+            result = dataset.ExecuteSQL(f"SELECT CreateSpatialIndex('{self.layer_name}', 'geometry')")
+            if result is not None:
+                dataset.ReleaseResultSet(result)
+            dataset = None
+            self.write_seconds += time.perf_counter() - start
+        except Exception as e:
+            self.error = e
+            # Keep draining so producers blocked on a full queue can see the error, until
+            # close() sends the sentinel (unless it already has, e.g. the final commit failed)
+            while not finished and self.records.get() is not None:
+                pass
+
+class ScanStats:
+    """Timings and throughput for one catalogue scan.
 
-            corners = get_corner_coords(dataset)
+    Records seconds spent per stage (walk, open, geotransform, crs, write),
+    files/sec, discovery queue depth and files in flight, and the slowest
+    files. Logs a progress line every progress_interval seconds and can
+    write the full summary as a JSON or CSV report.
+    """
 
-            # Check for georeferenced rasters
-            if corners[0][0] == 0 or corners[2][1] == 0:
-                raise ValueError(f"Non-georeferenced raster: {file}")
+    stages = ["walk", "open", "geotransform", "crs", "write"]
 
-            prj_file = file.replace(os.path.splitext(file)[1], ".prj")
-            crs = get_crs_from_prj(prj_file) if os.path.isfile(prj_file) else "N/A"
+    def __init__(self, log_queue=None, slowest_n=20, progress_interval=10.0):
+        self.log_queue = log_queue
+        self.slowest_n = slowest_n
+        self.progress_interval = progress_interval
+        self.start = time.perf_counter()
+        self.last_progress = self.start
+        self.stage_seconds = dict.fromkeys(self.stages, 0.0)
+        self.stage_counts = dict.fromkeys(self.stages, 0)
+        self.files_discovered = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.slowest = []  # min-heap of (seconds, file)
+        self.lock = Lock()
 
+    def add_stage(self, stage, seconds, count=1):
+        """Add time spent in a stage."""
+        with self.lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_counts[stage] += count
+
+    def observe_queue_depth(self, depth):
+        """Record how many discovered files are waiting to be read."""
+        self.queue_depth = depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def observe_in_flight(self, in_flight):
+        """Record how many files are being read right now."""
+        self.in_flight = in_flight
+        self.max_in_flight = max(self.max_in_flight, in_flight)
+
+    def file_done(self, file, timings, error=None):
+        """Record a finished file and its per-stage timings, logging progress when due."""
+        with self.lock:
+            self.files_done += 1
+            self.files_failed += bool(error)
+            self.in_flight = max(self.in_flight - 1, 0)
+            for stage in ("open", "geotransform", "crs"):
+                if stage in timings:
+                    self.stage_seconds[stage] += timings[stage]
+                    self.stage_counts[stage] += 1
+            total = sum(timings.get(stage, 0.0) for stage in ("open", "geotransform", "crs"))
+            if len(self.slowest) < self.slowest_n:
+                heapq.heappush(self.slowest, (total, file))
+            elif total > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (total, file))
+        now = time.perf_counter()
+        if self.log_queue is not None and now - self.last_progress >= self.progress_interval:
+            self.last_progress = now
+            log_message(self.log_queue, self.progress_line())
+
+    def files_per_second(self):
+        elapsed = time.perf_counter() - self.start
+        return self.files_done / elapsed if elapsed else 0.0
+
+    def progress_line(self):
+        """One-line live summary of the scan so far."""
+        return (f"Progress: {self.files_done}/{self.files_discovered} files read "
+                f"({self.files_failed} failed), {self.files_per_second():.1f} files/s, "
+                f"{self.queue_depth} queued, {self.in_flight} in flight")
+
+    def summary(self):
+        """Machine-readable summary of the scan."""
+        with self.lock:
             return {
-                "filepath": os.path.normpath(file),
-                "filename": os.path.basename(file),
-                "crs": crs,
-                "minx": corners[0][0],
-                "miny": corners[0][1],
-                "maxx": corners[2][0],
-                "maxy": corners[2][1],
-                "geometry": Polygon(corners),
+                "elapsed_seconds": time.perf_counter() - self.start,
+                "files_discovered": self.files_discovered,
+                "files_done": self.files_done,
+                "files_failed": self.files_failed,
+                "files_per_second": self.files_per_second(),
+                "max_queue_depth": self.max_queue_depth,
+                "max_in_flight": self.max_in_flight,
+                "stages": {
+                    stage: {
+                        "count": self.stage_counts[stage],
+                        "total_seconds": self.stage_seconds[stage],
+                        "mean_ms": 1000 * self.stage_seconds[stage] / self.stage_counts[stage] if self.stage_counts[stage] else 0.0,
+                    }
+                    for stage in self.stages
+                },
+                "slowest_files": [
+                    {"file": file, "seconds": seconds} for seconds, file in sorted(self.slowest, reverse=True)
+                ],
             }
-        except Exception as e:
-            log_message(log_queue, f"Error processing {file}: {e}")
-            return None
 
-    def save_results(data, unique_id):
-        """Save processed data to GeoPackage."""
-        if not data:
+    def write_report(self, report_path):
+        """Write the summary as JSON, or as CSV if report_path ends in .csv."""
+        summary = self.summary()
+        if report_path.lower().endswith(".csv"):
+            with open(report_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["kind", "name", "count", "seconds"])
+                for name in ("elapsed_seconds", "files_per_second"):
+                    writer.writerow(["scan", name, "", summary[name]])
+                for name in ("files_discovered", "files_done", "files_failed", "max_queue_depth", "max_in_flight"):
+                    writer.writerow(["scan", name, summary[name], ""])
+                for stage, values in summary["stages"].items():
+                    writer.writerow(["stage", stage, values["count"], values["total_seconds"]])
+                for slow in summary["slowest_files"]:
+                    writer.writerow(["slowest_file", slow["file"], 1, slow["seconds"]])
+        else:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+
+def timed_iter(iterable, stats, stage):
+    """Yield from iterable, adding the time spent producing each item to a ScanStats stage."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
             return
-        gdf = gpd.GeoDataFrame(data, geometry="geometry", crs=output_crs or default_crs)
-        output_gpkg = f"{output_gpkg_base}_{unique_id}.gpkg"
-        gdf.to_file(output_gpkg, driver="GPKG")
-        log_message(log_queue, f"Saved results to {output_gpkg}")
+        stats.add_stage(stage, time.perf_counter() - start)
+        yield item
 
-    # Discover files and process them in parallel
-    log_message(log_queue, "Starting discovery...")
-    discover_files()
-    log_message(log_queue, f"Discovered {len(raster_files)} files.")
+def iter_in_background(iterable, queue_size, stats=None):
+    """Run an iterator in its own thread, handing items over through a bounded queue.
 
-    batch_size = 50  # Process files in batches for efficiency
-    processed_data = []
+    The producer blocks once queue_size items are waiting, so a fast producer
+    can't run ahead of the consumer. Exceptions are re-raised in the consumer.
+    The queue depth is reported to stats (a ScanStats) if given.
+    """
+    items = Queue(maxsize=queue_size)
+    done = object()
     errors = []
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(process_file, file) for file in raster_files]
-        for i, future in enumerate(futures):
-            result = future.result()
-            if result:
-                processed_data.append(result)
-            if (i + 1) % batch_size == 0 or i == len(futures) - 1:
-                # Save batch results
-                save_results(processed_data, str(uuid.uuid4())[:8])
-                processed_data.clear()
-
-    log_message(log_queue, "Processing complete!")
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            items.put(done)
+
+    Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            break
+        if stats is not None:
+            stats.observe_queue_depth(items.qsize())
+        yield item
+    if errors:
+        raise errors[0]
+
+def map_bounded(executor, func, items, max_in_flight, on_pending=None):
+    """Submit func(item) for each item, yielding results in completion order.
+
+    At most max_in_flight futures are pending at once, so items are pulled
+    from the iterable only as fast as the workers finish them and one slow
+    item never holds up the results behind it. on_pending, if given, is
+    called with the number of pending futures after each submit.
+    """
+    pending = set()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(func, item))
+        if on_pending:
+            on_pending(len(pending))
+    for future in as_completed(pending):
+        yield future.result()
+
+def read_catalogue_entry(item):
+    """Worker: read one (file, siblings) pair, returning (file, record, error message, stage timings)."""
+    file, siblings = item
+    timings = {}
+    try:
+        return file, read_raster_record(file, siblings, timings), None, timings
+    except Exception as e:
+        return file, None, str(e), timings
+
+def read_catalogue_batch(items, threads):
+    """Process-pool worker: read a batch of (file, siblings) pairs with its own pool of threads."""
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(read_catalogue_entry, items))
+
+def read_catalogue_entries(items, max_workers, max_in_flight, process_workers=0, batch_size=64, on_pending=None):
+    """Read (file, siblings) pairs in parallel, yielding (file, record, error, timings) as they complete.
+
+    By default files are read by max_workers threads. With process_workers,
+    batches of batch_size files are spread over that many processes, each
+    reading its batch with max_workers threads, which helps once header
+    parsing rather than storage latency is the limit. on_pending is called
+    with the (approximate) number of files in flight.
+    """
+    if not process_workers:
+        with ThreadPoolExecutor(max_workers) as executor:
+            yield from map_bounded(executor, read_catalogue_entry, items, max_in_flight, on_pending)
+        return
+
+    items = iter(items)
+    batches = iter(lambda: list(islice(items, batch_size)), [])
+    # spawned, not forked: the writer, discovery and walker threads may be inside GDAL or
+    # SQLite when the pool starts, and a forked child could inherit a lock they hold
+    with ProcessPoolExecutor(process_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        submit_batch = lambda batch: executor.submit(read_catalogue_batch, batch, max_workers)
+        pending = set()
+        for batch in batches:
+            if len(pending) >= process_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            pending.add(submit_batch(batch))
+            if on_pending:
+                on_pending(len(pending) * batch_size)
+        for future in as_completed(pending):
+            yield from future.result()
+
+def process_rasters_parallel(input_folder, output_gpkg_base, output_crs, default_crs, search_subfolders, log_queue, index_path=None, commit_size=5000, max_workers=None, max_in_flight=None, queue_size=1000, process_workers=0, skip_keywords=None, extensions=None, report_path=None, progress_interval=10.0):
+    """Catalog and process raster files in parallel.
+
+    Discovery runs in its own thread and streams files through a bounded
+    queue to a pool of max_workers threads (optionally inside process_workers
+    processes, see read_catalogue_entries), with at most max_in_flight files
+    being processed at once; results are consumed as they complete and
+    written to a single GeoPackage by a GeoPackageWriter, committing every
+    commit_size features. Memory stays flat however large the archive is.
+
+    With an index_path, only files that are new or whose size/mtime (or
+    .prj sidecar) changed since the last scan are opened; deleted files are
+    dropped from the index and the catalogue is rewritten from it. Files are
+    only treated as deleted in folders the scan actually listed, so a folder
+    that can't be read, or subfolders when search_subfolders is off, keep
+    their indexed entries.
+
+    Stage timings, throughput and the slowest files are collected in a
+    ScanStats; a progress line is logged every progress_interval seconds and
+    the summary is written to report_path (.json or .csv) if given.
+    """
+    extensions = [e.lower() for e in (extensions or default_extensions)]
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    max_in_flight = max_in_flight or max_workers * 4
+    stats = ScanStats(log_queue, progress_interval=progress_interval)
+    unlisted_folders = []  # folders the walk couldn't list, filled in as discovery runs
+
+    def folder_error(error):
+        """Log a folder that couldn't be listed and remember it, so its indexed files aren't taken as deleted."""
+        unlisted_folders.append(os.path.normpath(error.filename))
+        log_message(log_queue, f"Could not list folder {error.filename}: {error.strerror}")
+
+    def discover_files():
+        """Discover files recursively or in a single folder, yielding (file, siblings, stat) as they are found.
+
+        With an index, stat is the file's get_file_stat tuple, taken by the
+        walker's threads while listing; otherwise it is None.
+        """
+        if should_skip_folder(os.path.basename(os.path.normpath(input_folder)), skip_keywords):
+            log_message(log_queue, f"Skipping folder and subfolders: {input_folder}")
+        # Folders are listed concurrently; skipped folders, or all subfolders if we aren't searching them, are never listed
+        # An incremental rescan needs every raster's size and mtime; stat them in the walker's pool
+        # rather than one at a time afterwards, as each stat is a round trip on network shares
+        folders = walk_folders(input_folder, skip=lambda name: should_skip_folder(name, skip_keywords),
+                               max_depth=None if search_subfolders else 0,
+                               stat=bool(index_path), stat_extensions=extensions + [".prj"], onerror=folder_error)
+        for listing in timed_iter(folders, stats, "walk"):
+            root_dir = listing.path
+            files = [entry.name for entry in listing.files]
+
+            # Filter raster files, passing the folder listing along so sidecars can be found without extra stats
+            relevant_files = [entry for entry in listing.files if os.path.splitext(entry.name)[1].lower() in extensions]
+            if relevant_files:
+                stats.files_discovered += len(relevant_files)
+                log_message(log_queue, f"Discovered folder with files: {root_dir}")
+                siblings = {f.lower(): f for f in files}
+                entries_by_name = {entry.name: entry for entry in listing.files}
+                for entry in relevant_files:
+                    stat = None
+                    if index_path:
+                        prj_file = find_sidecar(entry.path, siblings, [".prj"])
+                        stat = get_file_stat(entry, prj_file and entries_by_name[os.path.basename(prj_file)])
+                    yield entry.path, siblings, stat
+            else:
+                log_message(log_queue, f"No relevant files found in folder: {root_dir}")
+
+    def read_entries(items):
+        """Read catalogue entries for discovered files, logging failures."""
+        entries = read_catalogue_entries(items, max_workers, max_in_flight, process_workers,
+                                         on_pending=stats.observe_in_flight)
+        for file, record, error, timings in entries:
+            stats.file_done(file, timings, error)
+            if error:
+                log_message(log_queue, f"Error processing {file}: {error}")
+            yield file, record, error
+
+    def process_with_index(files):
+        """Rescan against the catalogue index, opening only new or modified files."""
+        connection = open_catalogue_index(index_path)
+        try:
+            indexed = load_indexed_stats(connection, input_folder)
+            seen = set()
+            pending_stats = {}
+
+            def changed_files():
+                """Yield (file, siblings) for discovered files that are new or modified."""
+                for file, siblings, stat in files:
+                    filepath = os.path.normpath(file)
+                    seen.add(filepath)
+                    if indexed.get(filepath) != stat:
+                        pending_stats[file] = stat
+                        yield file, siblings
+
+            batch_size = 500  # Commit index updates in batches so an interrupted scan keeps its progress
+            entries = []
+            changed_count = 0
+            for file, record, error in read_entries(changed_files()):
+                size, mtime_ns, prj_mtime_ns = pending_stats.pop(file)
+                if error:
+                    entries.append((os.path.normpath(file), size, mtime_ns, os.path.basename(file),
+                                    None, None, None, None, None, error, prj_mtime_ns))
+                else:
+                    entries.append((record["filepath"], size, mtime_ns, record["filename"], record["crs"],
+                                    record["minx"], record["miny"], record["maxx"], record["maxy"], None,
+                                    prj_mtime_ns))
+                changed_count += 1
+                if len(entries) == batch_size:
+                    start = time.perf_counter()
+                    update_catalogue_index(connection, entries, [])
+                    stats.add_stage("write", time.perf_counter() - start, len(entries))
+                    entries.clear()
+            # Discovery has finished, so unlisted_folders is complete. Only files in folders the walk
+            # listed can be known to be deleted: not those under a folder that couldn't be read, nor
+            # in subfolders when they weren't searched
+            root = os.path.normpath(input_folder)
+            unlisted_prefixes = tuple(index_folder_prefix(folder) for folder in unlisted_folders)
+            deleted = [
+                filepath for filepath in indexed
+                if filepath not in seen
+                and (search_subfolders or os.path.dirname(filepath) == root)
+                and not filepath.startswith(unlisted_prefixes)
+            ]
+            start = time.perf_counter()
+            update_catalogue_index(connection, entries, deleted)
+            stats.add_stage("write", time.perf_counter() - start, len(entries) + len(deleted))
+            log_message(log_queue, f"Discovered {stats.files_discovered} files.")
+            log_message(log_queue, f"{changed_count} new or modified files, {len(deleted)} deleted files.")
+
+            if changed_count or deleted or not os.path.exists(output_gpkg):
+                with GeoPackageWriter(output_gpkg, output_crs or default_crs, commit_size) as writer:
+                    count = export_catalogue_index(connection, writer, input_folder)
+                stats.add_stage("write", writer.write_seconds, writer.count)
+                log_message(log_queue, f"Saved {count} catalogued files to {output_gpkg}")
+            else:
+                log_message(log_queue, f"No changes; {output_gpkg} is up to date.")
+        finally:
+            connection.close()
+
+    def finish():
+        """Log the final summary and write the report."""
+        log_message(log_queue, stats.progress_line())
+        if report_path:
+            stats.write_report(report_path)
+            log_message(log_queue, f"Wrote scan report to {report_path}")
+        log_message(log_queue, "Processing complete!")
+
+    # Discover files and process them in parallel as they are found
+    log_message(log_queue, "Starting discovery...")
+    files = iter_in_background(discover_files(), queue_size, stats)
+
+    output_gpkg = catalogue_path_for(output_gpkg_base)
+    if index_path:
+        process_with_index(files)
+        finish()
+        return stats
+
+    with GeoPackageWriter(output_gpkg, output_crs or default_crs, commit_size) as writer:
+        for file, record, error in read_entries((file, siblings) for file, siblings, _ in files):
+            if record:
+                writer.write(record)
+    stats.add_stage("write", writer.write_seconds, writer.count)
+
+    log_message(log_queue, f"Discovered {stats.files_discovered} files.")
+    log_message(log_queue, f"Saved {writer.count} catalogued files to {output_gpkg}")
+    finish()
+    return stats
+
+def catalogue_rasters(input_folder, output_gpkg, output_crs="EPSG:27700", search_subfolders=True,
+                      skip_keywords=None, extensions=None, threads=None, processes=0, incremental=False,
+                      index_path=None, commit_size=5000, max_in_flight=None, log_queue=None,
+                      report_path=None, progress_interval=10.0):
+    """Catalogue every georeferenced raster under input_folder into output_gpkg, without any UI.
+
+    threads sets the reader threads (per process when processes > 0) so the
+    pools can be tuned to the storage: more threads for high-latency network
+    shares, more processes when parsing is the bottleneck. skip_keywords and
+    extensions default to default_skip_keywords and default_extensions.
+    incremental keeps a catalogue index at index_path (default: next to the
+    output) so rescans only open new or changed files. Log messages go to
+    log_queue (anything with a put method), printed by default. Returns the
+    scan's ScanStats; report_path writes them as JSON or CSV.
+    """
+    if incremental and not index_path:
+        index_path = index_path_for(output_gpkg)
+    return process_rasters_parallel(
+        input_folder, output_gpkg, output_crs, output_crs, search_subfolders, log_queue or ConsoleLog(),
+        index_path=index_path, commit_size=commit_size, max_workers=threads, max_in_flight=max_in_flight,
+        process_workers=processes, skip_keywords=skip_keywords, extensions=extensions,
+        report_path=report_path, progress_interval=progress_interval,
+    )
 
 def get_corner_coords(dataset):
     """Retrieve bounding box corner coordinates from a GDAL dataset."""
-    width = dataset.RasterXSize
-    height = dataset.RasterYSize
-    gt = dataset.GetGeoTransform()
+    return corners_from_geotransform(dataset.RasterXSize, dataset.RasterYSize, dataset.GetGeoTransform())
 
+def corners_from_geotransform(width, height, gt):
+    """Bounding box corner coordinates for a raster of the given size and geotransform."""
     if gt is None:
         raise ValueError("No geotransformation available.")
 
@@ -132,86 +903,232 @@ def get_corner_coords(dataset):
     maxy = gt[3]
     return [(minx, miny), (minx, maxy), (maxx, maxy), (maxx, miny)]
 
+# Parsed .prj results keyed by a hash of the file content; thousands of tiles share a projection
+prj_crs_cache = {}
+
 def get_crs_from_prj(prj_file):
-    """Extract CRS from a .prj file using pyproj."""
-    with open(prj_file, "r") as file:
-        prj_content = file.read()
-    try:
-        crs = CRS.from_string(prj_content)
-        return crs.to_string()
-    except Exception as e:
-        return f"ERROR parsing CRS: {e}"
+    """Extract CRS from a .prj file using pyproj, parsing each distinct .prj content only once."""
+    with open(prj_file, "rb") as file:
+        prj_bytes = file.read()
+    prj_hash = hashlib.sha1(prj_bytes).hexdigest()
+    if prj_hash not in prj_crs_cache:
+        try:
+            crs = CRS.from_string(prj_bytes.decode("utf-8", errors="replace"))
+            prj_crs_cache[prj_hash] = crs.to_string()
+        except Exception as e:
+            prj_crs_cache[prj_hash] = f"ERROR parsing CRS: {e}"
+    return prj_crs_cache[prj_hash]
+
+def make_synthetic_records(n_records):
+    """Build catalogue records for a grid of 1km tiles, for benchmarking writers."""
+    records = []
+    for i in range(n_records):
+        minx = 400000 + (i % 500) * 1000
+        miny = 100000 + (i // 500) * 1000
+        records.append({
+            "filepath": os.path.normpath(f"/archive/tile_{i}.tif"),
+            "filename": f"tile_{i}.tif",
+            "crs": "EPSG:27700",
+            "minx": minx,
+            "miny": miny,
+            "maxx": minx + 1000,
+            "maxy": miny + 1000,
+            "geometry": box(minx, miny, minx + 1000, miny + 1000),
+        })
+    return records
+
+def benchmark_writers(n_records=20000, commit_size=5000, crs="EPSG:27700"):
+    """Time the old 50-record uuid fragment files against the single GeoPackageWriter."""
+    records = make_synthetic_records(n_records)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_gpkg_base = os.path.join(temp_dir, "fragments")
+        start = time.perf_counter()
+        for i in range(0, n_records, 50):
+            gdf = gpd.GeoDataFrame(records[i:i + 50], geometry="geometry", crs=crs)
+            gdf.to_file(f"{output_gpkg_base}_{str(uuid.uuid4())[:8]}.gpkg", driver="GPKG")
+        fragment_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with GeoPackageWriter(os.path.join(temp_dir, "catalogue.gpkg"), crs, commit_size) as writer:
+            for record in records:
+                writer.write(record)
+        writer_seconds = time.perf_counter() - start
+
+    print(f"{n_records} records")
+    print(f"fragments: {fragment_seconds:.3f}s ({n_records / fragment_seconds:,.0f} records/s)")
+    print(f"writer:    {writer_seconds:.3f}s ({n_records / writer_seconds:,.0f} records/s)")
+    print(f"speedup:   {fragment_seconds / writer_seconds:.1f}x")
+
+def benchmark_metadata_readers(input_folder, limit=2000, extensions=(".tif", ".png")):
+    """Time full GDAL opens against the header/sidecar reader on up to limit rasters from input_folder."""
+    items = []
+    for listing in walk_folders(input_folder):
+        root_dir, files = listing.path, [entry.name for entry in listing.files]
+        siblings = {f.lower(): f for f in files}
+        items.extend((os.path.join(root_dir, f), siblings) for f in files if os.path.splitext(f)[1].lower() in extensions)
+        if len(items) >= limit:
+            break
+    items = items[:limit]
+    if not items:
+        print(f"No rasters found in {input_folder}")
+        return
+
+    def time_reader(siblings_for):
+        prj_crs_cache.clear()
+        start = time.perf_counter()
+        for file, siblings in items:
+            try:
+                read_raster_record(file, siblings_for(siblings))
+            except Exception:
+                pass
+        return time.perf_counter() - start
 
-def start_processing(input_folder, output_gpkg_base, output_crs, default_crs, search_subfolders, log_box):
+    gdal_seconds = time_reader(lambda siblings: None)
+    header_seconds = time_reader(lambda siblings: siblings)
+    print(f"{len(items)} rasters")
+    print(f"gdal.Open: {gdal_seconds:.3f}s ({len(items) / gdal_seconds:,.0f} files/s)")
+    print(f"headers:   {header_seconds:.3f}s ({len(items) / header_seconds:,.0f} files/s)")
+    print(f"speedup:   {gdal_seconds / header_seconds:.1f}x")
+
+def start_processing(root, input_folder, output_gpkg_base, output_crs, default_crs, search_subfolders, incremental, log_box):
     """Start processing workflow."""
     log_queue = Queue()
-    log_updater(log_box, log_queue)
+    log_updater(root, log_box, log_queue)
+    index_path = index_path_for(output_gpkg_base) if incremental else None
 
     def processing():
         process_rasters_parallel(
-            input_folder, output_gpkg_base, output_crs, default_crs, search_subfolders, log_queue
+            input_folder, output_gpkg_base, output_crs, default_crs, search_subfolders, log_queue, index_path
         )
 
     Thread(target=processing).start()
 
-# Main UI Window
-root = tk.Tk()
-root.title("Raster Processing Tool")
-root.geometry("600x600")
-
-# Input Folder Frame
-input_frame = tk.Frame(root)
-input_frame.pack(pady=10, padx=10, fill="x")
-tk.Label(input_frame, text="Input Folder:").grid(row=0, column=0, sticky="w")
-input_folder_var = tk.StringVar()
-tk.Entry(input_frame, textvariable=input_folder_var, width=50).grid(row=0, column=1, padx=5)
-tk.Button(input_frame, text="Browse", command=lambda: input_folder_var.set(filedialog.askdirectory())).grid(row=0, column=2)
-
-# Output File Frame
-output_frame = tk.Frame(root)
-output_frame.pack(pady=10, padx=10, fill="x")
-tk.Label(output_frame, text="Output file:").grid(row=0, column=0, sticky="w")
-output_gpkg_var = tk.StringVar()
-tk.Entry(output_frame, textvariable=output_gpkg_var, width=50).grid(row=0, column=1, padx=5)
-tk.Button(output_frame, text="Browse", command=lambda: output_gpkg_var.set(filedialog.asksaveasfilename(defaultextension=".gpkg", filetypes=[("GeoPackage files", "*.gpkg")]))).grid(row=0, column=2)
-
-# CRS Selection Frame
-crs_frame = tk.Frame(root)
-crs_frame.pack(pady=10, padx=10, fill="x")
-tk.Label(crs_frame, text="Select CRS:").grid(row=0, column=0, sticky="w")
-selected_crs = tk.StringVar(value="EPSG:27700")
-crs_options = ["EPSG:27700 - OSGB 1936", "EPSG:3857 - WGS 84 / Pseudo-Mercator", "EPSG:4326 - WGS 84"]
-tk.OptionMenu(crs_frame, selected_crs, *crs_options).grid(row=0, column=1, padx=5)
-
-custom_crs_entry = tk.Entry(crs_frame, width=15)
-custom_crs_entry.insert(0, "Custom EPSG Code")
-custom_crs_entry.grid(row=0, column=2, padx=5)
-
-# Subfolder Checkbox
-search_subfolders_var = tk.BooleanVar()
-tk.Checkbutton(root, text="Include Subfolders", variable=search_subfolders_var).pack()
-
-# Buttons Frame
-button_frame = tk.Frame(root)
-button_frame.pack(pady=10)
-tk.Button(button_frame, text="Start Processing", command=lambda: start_processing(
-    input_folder_var.get(),
-    output_gpkg_var.get(),
-    selected_crs.get().split(" ")[0],
-    "EPSG:27700",
-    search_subfolders_var.get(),
-    log_box,
-)).grid(row=0, column=0, padx=5)
-tk.Button(button_frame, text="Close", command=root.destroy).grid(row=0, column=1, padx=5)
-
-# Log Frame
-log_frame = tk.Frame(root)
-log_frame.pack(pady=10, padx=10, fill="both", expand=True)
-tk.Label(log_frame, text="Log:").pack(anchor="w")
-log_box = tk.Text(log_frame, wrap=tk.WORD, state=tk.DISABLED, height=15)
-log_box.pack(side=tk.LEFT, fill="both", expand=True)
-scrollbar = tk.Scrollbar(log_frame, command=log_box.yview)
-scrollbar.pack(side=tk.RIGHT, fill="y")
-log_box.config(yscrollcommand=scrollbar.set)
-
-root.mainloop()
+def selected_output_crs(selected_crs, custom_crs):
+    """The CRS picked in the UI: a custom EPSG code if one was typed, otherwise the dropdown choice."""
+    custom_crs = custom_crs.strip()
+    if custom_crs and custom_crs != "Custom EPSG Code":
+        return custom_crs if ":" in custom_crs else f"EPSG:{custom_crs}"
+    return selected_crs.split(" ")[0]
+
+def run_ui():
+    """Build and run the Tk front end."""
+    import tkinter as tk
+    from tkinter import filedialog
+
+    # Main UI Window
+    root = tk.Tk()
+    root.title("Raster Processing Tool")
+    root.geometry("600x600")
+
+    # Input Folder Frame
+    input_frame = tk.Frame(root)
+    input_frame.pack(pady=10, padx=10, fill="x")
+    tk.Label(input_frame, text="Input Folder:").grid(row=0, column=0, sticky="w")
+    input_folder_var = tk.StringVar()
+    tk.Entry(input_frame, textvariable=input_folder_var, width=50).grid(row=0, column=1, padx=5)
+    tk.Button(input_frame, text="Browse", command=lambda: input_folder_var.set(filedialog.askdirectory())).grid(row=0, column=2)
+
+    # Output File Frame
+    output_frame = tk.Frame(root)
+    output_frame.pack(pady=10, padx=10, fill="x")
+    tk.Label(output_frame, text="Output file:").grid(row=0, column=0, sticky="w")
+    output_gpkg_var = tk.StringVar()
+    tk.Entry(output_frame, textvariable=output_gpkg_var, width=50).grid(row=0, column=1, padx=5)
+    tk.Button(output_frame, text="Browse", command=lambda: output_gpkg_var.set(filedialog.asksaveasfilename(defaultextension=".gpkg", filetypes=[("GeoPackage files", "*.gpkg")]))).grid(row=0, column=2)
+
+    # CRS Selection Frame
+    crs_frame = tk.Frame(root)
+    crs_frame.pack(pady=10, padx=10, fill="x")
+    tk.Label(crs_frame, text="Select CRS:").grid(row=0, column=0, sticky="w")
+    selected_crs = tk.StringVar(value="EPSG:27700")
+    crs_options = ["EPSG:27700 - OSGB 1936", "EPSG:3857 - WGS 84 / Pseudo-Mercator", "EPSG:4326 - WGS 84"]
+    tk.OptionMenu(crs_frame, selected_crs, *crs_options).grid(row=0, column=1, padx=5)
+
+    custom_crs_entry = tk.Entry(crs_frame, width=15)
+    custom_crs_entry.insert(0, "Custom EPSG Code")
+    custom_crs_entry.grid(row=0, column=2, padx=5)
+
+    # Subfolder Checkbox
+    search_subfolders_var = tk.BooleanVar()
+    tk.Checkbutton(root, text="Include Subfolders", variable=search_subfolders_var).pack()
+
+    # Incremental Checkbox
+    incremental_var = tk.BooleanVar()
+    tk.Checkbutton(root, text="Incremental (only open new or changed files)", variable=incremental_var).pack()
+
+    # Buttons Frame
+    button_frame = tk.Frame(root)
+    button_frame.pack(pady=10)
+    tk.Button(button_frame, text="Start Processing", command=lambda: start_processing(
+        root,
+        input_folder_var.get(),
+        output_gpkg_var.get(),
+        selected_output_crs(selected_crs.get(), custom_crs_entry.get()),
+        "EPSG:27700",
+        search_subfolders_var.get(),
+        incremental_var.get(),
+        log_box,
+    )).grid(row=0, column=0, padx=5)
+    tk.Button(button_frame, text="Close", command=root.destroy).grid(row=0, column=1, padx=5)
+
+    # Log Frame
+    log_frame = tk.Frame(root)
+    log_frame.pack(pady=10, padx=10, fill="both", expand=True)
+    tk.Label(log_frame, text="Log:").pack(anchor="w")
+    log_box = tk.Text(log_frame, wrap=tk.WORD, state=tk.DISABLED, height=15)
+    log_box.pack(side=tk.LEFT, fill="both", expand=True)
+    scrollbar = tk.Scrollbar(log_frame, command=log_box.yview)
+    scrollbar.pack(side=tk.RIGHT, fill="y")
+    log_box.config(yscrollcommand=scrollbar.set)
+
+    root.mainloop()
+
+def main():
+    """Command line entry point; runs the Tk UI when called with no arguments."""
+    if len(sys.argv) == 1:
+        run_ui()
+        return
+
+    parser = argparse.ArgumentParser(description="Catalogue georeferenced rasters into a GeoPackage of bounding boxes.")
+    parser.add_argument("input_folder", nargs="?", help="folder to scan")
+    parser.add_argument("output_gpkg", nargs="?", help="GeoPackage to write")
+    parser.add_argument("--crs", default="EPSG:27700", help="output CRS (default: %(default)s)")
+    parser.add_argument("--no-subfolders", action="store_true", help="only scan the top folder")
+    parser.add_argument("--skip", nargs="*", default=None, metavar="KEYWORD",
+                        help=f"folder names to skip (default: {' '.join(default_skip_keywords)})")
+    parser.add_argument("--extensions", nargs="+", default=default_extensions, metavar="EXT",
+                        help="raster extensions to catalogue (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=None, help="reader threads (per process with --processes)")
+    parser.add_argument("--processes", type=int, default=0, help="reader processes (default: none, threads only)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="files being read at once (default: 4x threads)")
+    parser.add_argument("--commit-size", type=int, default=5000, help="features per GeoPackage transaction")
+    parser.add_argument("--incremental", action="store_true", help="keep a catalogue index and only open new or changed files")
+    parser.add_argument("--index", help="catalogue index path (implies --incremental)")
+    parser.add_argument("--report", help="write stage timings, throughput and slowest files to this .json or .csv")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--gui", action="store_true", help="open the Tk UI")
+    parser.add_argument("--benchmark-writers", action="store_true", help="time fragment files against the single writer")
+    parser.add_argument("--benchmark-metadata", metavar="FOLDER", help="time GDAL opens against the header reader")
+    args = parser.parse_args()
+
+    if args.gui:
+        run_ui()
+        return
+    if args.benchmark_writers:
+        benchmark_writers(crs=args.crs)
+        return
+    if args.benchmark_metadata:
+        benchmark_metadata_readers(args.benchmark_metadata, extensions=tuple(args.extensions))
+        return
+    if not args.input_folder or not args.output_gpkg:
+        parser.error("input_folder and output_gpkg are required")
+
+    catalogue_rasters(
+        args.input_folder, args.output_gpkg, output_crs=args.crs, search_subfolders=not args.no_subfolders,
+        skip_keywords=args.skip, extensions=args.extensions, threads=args.threads, processes=args.processes,
+        incremental=args.incremental or bool(args.index), index_path=args.index, commit_size=args.commit_size,
+        max_in_flight=args.max_in_flight, report_path=args.report, progress_interval=args.progress_interval,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import csv
+import glob
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely import STRtree, box, points, touches
+
+try:
+    from NGR_to_E_N import find_ngr_column, ngr_to_east_north_bulk
+except ImportError:  # only needed for NGR lookups
+    find_ngr_column = ngr_to_east_north_bulk = None
+
+
+class RasterCatalogue:
+    """Spatial lookups over the output of georaster_catalogue_with_bboxes.py.
+
+    The catalogue footprints are held in memory with an STRtree, so point,
+    bbox and polygon queries don't have to scan every row. Query geometries
+    must be in the catalogue's CRS, apart from NGRs which are converted
+    from British National Grid.
+    """
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue.reset_index(drop=True)
+        self.tree = STRtree(self.catalogue.geometry.values)
+
+    @classmethod
+    def from_files(cls, *patterns):
+        """Load one or more catalogue GeoPackages (paths or glob patterns, e.g. old uuid fragments)."""
+        paths = sorted({path for pattern in patterns for path in (glob.glob(pattern) or [pattern])})
+        frames = [gpd.read_file(path) for path in paths]
+        catalogue = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return cls(gpd.GeoDataFrame(catalogue, geometry="geometry", crs=frames[0].crs))
+
+    def query_indices(self, geometry, predicate="intersects"):
+        """Row positions of the rasters matching a single geometry."""
+        return self.tree.query(geometry, predicate=predicate)
+
+    def query_geometry(self, geometry, predicate="intersects"):
+        """Rasters whose footprint matches a single shapely geometry (intersects by default)."""
+        return self.catalogue.iloc[np.sort(self.query_indices(geometry, predicate))]
+
+    def query_point(self, x, y):
+        """Rasters covering the point x, y."""
+        return self.query_geometry(points(x, y))
+
+    def query_bbox(self, minx, miny, maxx, maxy):
+        """Rasters intersecting a bounding box."""
+        return self.query_geometry(box(minx, miny, maxx, maxy))
+
+    def query_many(self, geometries, predicate="intersects"):
+        """Bulk join: match an array of query geometries against the catalogue in one call.
+
+        Returns the matching catalogue rows with a query_index column holding
+        the position of the query geometry each row matched.
+        """
+        query_index, catalogue_index = self.tree.query(np.asarray(geometries), predicate=predicate)
+        matches = self.catalogue.iloc[catalogue_index].copy()
+        matches.insert(0, "query_index", query_index)
+        return matches.reset_index(drop=True)
+
+    def query_ngrs(self, grid_refs):
+        """Bulk join a column of NGRs against the catalogue.
+
+        An NGR names a grid square rather than a point (1 m for 10 digits,
+        1 km for 4, 10 km for 2), so each is matched against the rasters
+        overlapping its square; footprints that only touch the square's edge
+        don't count. Invalid NGRs match nothing. Returns the same frame as
+        query_many, where query_index is the position in grid_refs.
+        """
+        if ngr_to_east_north_bulk is None:
+            raise ImportError("NGR lookups need NGR_to_E_N.py alongside this script")
+        refs = np.asarray(grid_refs, dtype=str).ravel()
+        easting, northing, valid = ngr_to_east_north_bulk(refs)
+        valid_positions = np.flatnonzero(valid)
+        # easting/northing are the square's south-west corner; its size follows from the digit count
+        n_digits = np.char.str_len(refs[valid]) - np.char.count(refs[valid], " ") - 2
+        size = 10.0 ** (5 - n_digits // 2)
+        easting, northing = easting[valid], northing[valid]
+        squares = gpd.GeoSeries(box(easting, northing, easting + size, northing + size), crs="EPSG:27700")
+        if self.catalogue.crs is not None and not squares.crs.equals(self.catalogue.crs):
+            squares = squares.to_crs(self.catalogue.crs)
+        matches = self.query_many(squares.values)
+        edge_only = touches(squares.values[matches["query_index"].to_numpy()], matches.geometry.values)
+        matches = matches[~edge_only].reset_index(drop=True)
+        matches["query_index"] = valid_positions[matches["query_index"].to_numpy()]
+        return matches
+
+
+def join_site_register(catalogue, input_csv, output_csv):
+    """Write every (site row, covering raster) pair for a CSV with an NGR column."""
+    with open(input_csv, newline="", encoding="utf-8") as infile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        ngr_index = header.index(find_ngr_column(header))
+        rows = list(reader)
+
+    matches = catalogue.query_ngrs([row[ngr_index] if len(row) > ngr_index else "" for row in rows])
+    with open(output_csv, "w", newline="", encoding="utf-8") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header + ["raster_filepath"])
+        for row_index, filepath in zip(matches["query_index"].tolist(), matches["filepath"].tolist()):
+            writer.writerow(rows[row_index] + [filepath])
+    return len(matches)
+
+
+def benchmark_queries(catalogue, n_queries=10000, seed=0):
+    """Time single point queries and one bulk query over random points inside the catalogue extent."""
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = catalogue.catalogue.total_bounds
+    query_points = points(rng.uniform(minx, maxx, n_queries), rng.uniform(miny, maxy, n_queries))
+
+    start = time.perf_counter()
+    for point in query_points:
+        catalogue.query_indices(point)
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = catalogue.query_many(query_points)
+    bulk_seconds = time.perf_counter() - start
+
+    print(f"{len(catalogue.catalogue)} rasters, {n_queries} point queries, {len(matches)} matches")
+    print(f"single: {single_seconds / n_queries * 1e6:.1f} us/query")
+    print(f"bulk:   {bulk_seconds / n_queries * 1e6:.1f} us/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find which catalogued rasters cover a point, bbox or list of sites.")
+    parser.add_argument("catalogue", nargs="+", help="catalogue GeoPackage(s) or glob patterns")
+    parser.add_argument("--point", nargs=2, type=float, metavar=("X", "Y"))
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MINX", "MINY", "MAXX", "MAXY"))
+    parser.add_argument("--ngr", help="a single NGR, e.g. TQ1234567890; matches rasters overlapping the grid square "
+                                      "it names (1 m at 10 digits, 1 km at 4)")
+    parser.add_argument("--sites", nargs=2, metavar=("INPUT_CSV", "OUTPUT_CSV"),
+                        help="join a CSV with an NGR column against the catalogue, matching each site's grid square")
+    parser.add_argument("--benchmark", action="store_true", help="time random point queries")
+    args = parser.parse_args()
+
+    catalogue = RasterCatalogue.from_files(*args.catalogue)
+    if args.benchmark:
+        benchmark_queries(catalogue)
+    if args.point:
+        matches = catalogue.query_point(*args.point)
+    elif args.bbox:
+        matches = catalogue.query_bbox(*args.bbox)
+    elif args.ngr:
+        matches = catalogue.query_ngrs([args.ngr])
+    elif args.sites:
+        count = join_site_register(catalogue, *args.sites)
+        print(f"Wrote {count} site/raster matches to {args.sites[1]}")
+        return
+    else:
+        return
+    for filepath in matches["filepath"]:
+        print(filepath)
+
+
+if __name__ == "__main__":
+    main()
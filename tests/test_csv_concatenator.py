@@ -0,0 +1,40 @@
+import csv
+
+from csv_concatenator import concatenate_csvs, union_columns
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+    return str(path)
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_union_keeps_duplicate_and_blank_names():
+    assert union_columns([["a", "", ""], ["a", "", "b"]]) == [("a", 0), ("", 0), ("", 1), ("b", 0)]
+
+
+def test_identical_headers_with_duplicate_and_blank_names_are_copied(tmp_path):
+    first = write_csv(tmp_path / "1.csv", [["a", "", "", "a"], ["1", "2", "3", "4"]])
+    second = write_csv(tmp_path / "2.csv", [["a", "", "", "a"], ["5", "6", "7", "8"]])
+    output = tmp_path / "merged.csv"
+
+    copied, reconciled, _ = concatenate_csvs([first, second], str(output))
+
+    assert (copied, reconciled) == (2, 0)
+    assert read_csv(output) == [["a", "", "", "a"], ["1", "2", "3", "4"], ["5", "6", "7", "8"]]
+
+
+def test_differing_headers_keep_every_duplicate_column(tmp_path):
+    first = write_csv(tmp_path / "1.csv", [["a", "", ""], ["1", "2", "3"]])
+    second = write_csv(tmp_path / "2.csv", [["", "b", "a"], ["4", "5", "6"]])
+    output = tmp_path / "merged.csv"
+
+    copied, reconciled, _ = concatenate_csvs([first, second], str(output))
+
+    assert (copied, reconciled) == (0, 2)
+    assert read_csv(output) == [["a", "", "", "b"], ["1", "2", "3", ""], ["6", "4", "", "5"]]
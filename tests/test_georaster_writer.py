@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+georaster = pytest.importorskip("georaster_catalogue_with_bboxes")
+
+
+class FakeDataset:
+    def __init__(self, fail):
+        self.fail = fail
+
+    def StartTransaction(self):
+        pass
+
+    def CommitTransaction(self):
+        if self.fail == "commit":
+            raise RuntimeError("disk full")
+
+    def ExecuteSQL(self, sql):
+        if self.fail == "spatial index":
+            raise RuntimeError("spatial index failed")
+
+
+class FakeDriver:
+    def __init__(self, fail):
+        self.fail = fail
+
+    def CreateDataSource(self, path):
+        return FakeDataset(self.fail)
+
+
+class FakeLayer:
+    def GetLayerDefn(self):
+        return None
+
+
+@pytest.mark.parametrize("fail", ["commit", "spatial index"])
+def test_close_raises_when_the_final_step_fails(monkeypatch, tmp_path, fail):
+    monkeypatch.setattr(georaster.ogr, "GetDriverByName", lambda name: FakeDriver(fail))
+    monkeypatch.setattr(georaster.GeoPackageWriter, "_create_layer", lambda self, dataset: FakeLayer())
+    writer = georaster.GeoPackageWriter(str(tmp_path / "catalogue.gpkg"), "EPSG:27700")
+    writer.thread.start()
+
+    errors = []
+
+    def close():
+        try:
+            writer.close()
+        except RuntimeError as e:
+            errors.append(e)
+
+    closer = threading.Thread(target=close, daemon=True)
+    closer.start()
+    closer.join(5)
+    assert not closer.is_alive(), "close() hung after the writer failed"
+    assert len(errors) == 1
@@ -0,0 +1,44 @@
+import csv
+
+from NGR_to_E_N import process_csv, process_csv_parallel, reverse_csv
+
+
+def write_csv(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    input_file = write_csv(tmp_path / "sites.csv", "site,ngr\na,TQ1234\n\nb,SU12\n\n")
+    expected = [["site", "ngr", "easting", "northing"], ["a", "TQ1234", "512000", "134000"],
+                ["b", "SU12", "410000", "120000"]]
+
+    process_csv(input_file, str(tmp_path / "out.csv"), chunk_size=1)
+    process_csv_parallel(input_file, str(tmp_path / "parallel.csv"), workers=2)
+
+    assert read_csv(tmp_path / "out.csv") == expected
+    assert read_csv(tmp_path / "parallel.csv") == expected
+
+
+def test_reverse_skips_blank_lines(tmp_path):
+    input_file = write_csv(tmp_path / "coords.csv", "easting,northing\n\n512000,134000\n")
+
+    reverse_csv(input_file, str(tmp_path / "out.csv"), precision=4)
+
+    assert read_csv(tmp_path / "out.csv") == [["easting", "northing", "ngr"], ["512000", "134000", "TQ1234"]]
+
+
+def test_parallel_falls_back_when_a_shard_boundary_splits_a_quoted_field(tmp_path):
+    notes = "\n".join(["long note line"] * 20)
+    input_file = write_csv(tmp_path / "sites.csv", f'site,ngr,notes\na,TQ1234,"{notes}"\nb,SU12,""\n')
+
+    process_csv(input_file, str(tmp_path / "serial.csv"))
+    process_csv_parallel(input_file, str(tmp_path / "parallel.csv"), workers=2)
+
+    assert read_csv(tmp_path / "parallel.csv") == read_csv(tmp_path / "serial.csv")
+    assert read_csv(tmp_path / "parallel.csv")[1] == ["a", "TQ1234", notes, "512000", "134000"]